@@ -1,9 +1,17 @@
 from django.contrib import admin
-from .models import SearchQuery
+from .models import SearchQuery, SerpArchive
 
 @admin.register(SearchQuery)
 class SearchQueryAdmin(admin.ModelAdmin):
     list_display = ('query', 'timestamp', 'results_count', 'results_file')
     list_filter = ('timestamp',)
     search_fields = ('query',)
-    readonly_fields = ('timestamp',)
\ No newline at end of file
+    readonly_fields = ('timestamp',)
+
+@admin.register(SerpArchive)
+class SerpArchiveAdmin(admin.ModelAdmin):
+    list_display = ('query', 'engine', 'language', 'country', 'created_at', 'results_count', 'compressed_size', 'reextracted_at')
+    list_filter = ('engine', 'language', 'country', 'created_at')
+    search_fields = ('query',)
+    exclude = ('html',)
+    readonly_fields = ('content_hash', 'compressed_size', 'results', 'created_at', 'reextracted_at')
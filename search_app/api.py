@@ -0,0 +1,298 @@
+import gzip
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import condition, require_GET
+
+from .models import SearchQuery, SerpArchive
+from .signals import get_fragment_version
+from .views import cached_search_web
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+RESULT_FIELDS = ('title', 'url', 'snippet', 'display_url')
+HISTORY_FIELDS = ('id', 'query', 'results_count', 'results_file', 'created_at', 'timestamp')
+
+
+class ApiError(Exception):
+    """Bad request parameters, reported to the client as a 400"""
+
+
+def _json_default(value):
+    # DjangoJSONEncoder's formats, so output doesn't depend on which encoder is installed
+    return DjangoJSONEncoder().default(value)
+
+
+def json_response(data, status=200):
+    """Compact JSON response, encoded with orjson when it is installed"""
+    if orjson is not None:
+        content = orjson.dumps(data, default=_json_default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+    else:
+        content = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return HttpResponse(content, status=status, content_type='application/json')
+
+
+def accepted_encodings(request):
+    """Content codings the client accepts, skipping any sent with q=0"""
+    encodings = set()
+    for item in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = item.partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding.strip() and quality > 0:
+            encodings.add(coding.strip().lower())
+    return encodings
+
+
+def compress_response(view):
+    """Brotli or gzip encode responses for clients that accept it"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if (response.streaming or response.has_header('Content-Encoding')
+                or len(response.content) < settings.SEARCH_API_MIN_COMPRESS_BYTES):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = accepted_encodings(request)
+        if brotli is not None and 'br' in accepted:
+            response.content = brotli.compress(response.content, quality=5)
+            response['Content-Encoding'] = 'br'
+        elif 'gzip' in accepted:
+            response.content = gzip.compress(response.content, compresslevel=6, mtime=0)
+            response['Content-Encoding'] = 'gzip'
+        else:
+            return response
+
+        response['Content-Length'] = str(len(response.content))
+        # Weaken strong ETags, the encoded body is no longer byte-identical
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+    return wrapper
+
+
+def api_view(view):
+    """GET-only JSON endpoint with compression and ApiError handling"""
+    @require_GET
+    @compress_response
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as e:
+            return json_response({'success': False, 'error': str(e)}, status=400)
+    return wrapper
+
+
+def get_int_param(request, name, default, minimum, maximum):
+    value = request.GET.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ApiError(f"'{name}' must be an integer")
+    if not minimum <= value <= maximum:
+        raise ApiError(f"'{name}' must be between {minimum} and {maximum}")
+    return value
+
+
+def get_fields_param(request, allowed):
+    """Parse ?fields=a,b into a tuple, defaulting to every allowed field"""
+    value = request.GET.get('fields', '').strip()
+    if not value:
+        return allowed
+    fields = tuple(field.strip() for field in value.split(',') if field.strip())
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ApiError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}")
+    return fields
+
+
+def select_fields(items, fields):
+    return [{field: item.get(field) for field in fields} for item in items]
+
+
+def get_query_param(request):
+    query = request.GET.get('q', '').strip()
+    if len(query) < 3:
+        raise ApiError('Query too short')
+    if len(query) > 200:
+        raise ApiError('Query too long')
+    return query
+
+
+def get_locale_param(request):
+    """Parse ?locale=de-DE into a (language, country) pair, defaulting to en-us"""
+    value = request.GET.get('locale', '').strip()
+    if not value:
+        return 'en', 'us'
+    from .scraping import parse_locale
+    try:
+        return parse_locale(value)
+    except ValueError as e:
+        raise ApiError(str(e))
+
+
+@api_view
+def search(request):
+    """Run (or serve from cache) a web search"""
+    query = get_query_param(request)
+    num_results = get_int_param(request, 'num', 10, 1, settings.SEARCH_API_MAX_RESULTS)
+    fields = get_fields_param(request, RESULT_FIELDS)
+    language, country = get_locale_param(request)
+
+    # Always fetch the maximum so every `num` shares one cache entry (and one scrape)
+    results = cached_search_web(
+        query, num_results=settings.SEARCH_API_MAX_RESULTS, language=language, country=country,
+    )[:num_results]
+    return json_response({
+        'success': True,
+        'query': query,
+        'locale': f"{language}-{country}",
+        'count': len(results),
+        'results': select_fields(results, fields),
+    })
+
+
+@api_view
+def search_locales(request):
+    """Run one query across several locales concurrently (?locales=en-US,de-DE)"""
+    from .scraping import parse_locale, search_locales as run_search_locales
+
+    query = get_query_param(request)
+    num_results = get_int_param(request, 'num', 10, 1, settings.SEARCH_API_MAX_RESULTS)
+    fields = get_fields_param(request, RESULT_FIELDS)
+
+    values = [value.strip() for value in request.GET.get('locales', '').split(',') if value.strip()]
+    if not values:
+        raise ApiError("'locales' is required, e.g. locales=en-US,de-DE")
+    if len(values) > settings.SEARCH_API_MAX_LOCALES:
+        raise ApiError(f"At most {settings.SEARCH_API_MAX_LOCALES} locales per request")
+    try:
+        locales = [parse_locale(value) for value in values]
+    except ValueError as e:
+        raise ApiError(str(e))
+
+    def search_locale(query, num_results, language, country):
+        # Same cache entries as /api/v1/search/, so a locale already searched costs no scrape
+        return cached_search_web(
+            query, num_results=settings.SEARCH_API_MAX_RESULTS, language=language, country=country,
+        )[:num_results]
+
+    data = run_search_locales(query, locales, num_results=num_results, search=search_locale)
+    return json_response({
+        'success': True,
+        'query': query,
+        'locales': {
+            locale: select_fields(results, fields)
+            for locale, results in data['locales'].items()
+        },
+        'overlap': data['overlap'],
+    })
+
+
+def _history_params(request):
+    limit = get_int_param(request, 'limit', 20, 1, settings.SEARCH_API_MAX_RESULTS)
+    offset = get_int_param(request, 'offset', 0, 0, 10 ** 9)
+    return limit, offset, get_fields_param(request, HISTORY_FIELDS)
+
+
+def _history_etag(request):
+    # The fragment version changes on every SearchQuery write
+    try:
+        limit, offset, fields = _history_params(request)
+    except ApiError:
+        return None
+    key = f"{get_fragment_version()}|{limit}|{offset}|{','.join(fields)}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+@api_view
+@condition(etag_func=_history_etag)
+def history(request):
+    """Most recent searches, newest first"""
+    limit, offset, fields = _history_params(request)
+    searches = SearchQuery.objects.order_by('-created_at').values(*fields)[offset:offset + limit]
+    searches = list(searches)
+    return json_response({
+        'success': True,
+        'count': len(searches),
+        'offset': offset,
+        'searches': searches,
+    })
+
+
+def _latest_archive(request):
+    """Newest archived page with results for ?q= in ?locale= (default en-us), or None"""
+    # Looked up once per request, for both the ETag and the response
+    if not hasattr(request, '_latest_archive'):
+        query = get_query_param(request)
+        language, country = get_locale_param(request)
+        request._latest_archive = (
+            SerpArchive.objects
+            .filter(query__iexact=query, language=language, country=country, results_count__gt=0)
+            .defer('html')
+            .order_by('-created_at')
+            .first()
+        )
+    return request._latest_archive
+
+
+def _results_etag(request):
+    try:
+        archive = _latest_archive(request)
+        num_results = get_int_param(request, 'num', settings.SEARCH_API_MAX_RESULTS, 1, settings.SEARCH_API_MAX_RESULTS)
+        fields = get_fields_param(request, RESULT_FIELDS)
+    except ApiError:
+        return None
+    if archive is None:
+        return None
+    reextracted = archive.reextracted_at.timestamp() if archive.reextracted_at else ''
+    key = f"{archive.pk}|{reextracted}|{num_results}|{','.join(fields)}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+@api_view
+@condition(etag_func=_results_etag)
+def stored_results(request):
+    """Most recently stored results for a query, without scraping"""
+    archive = _latest_archive(request)
+    num_results = get_int_param(request, 'num', settings.SEARCH_API_MAX_RESULTS, 1, settings.SEARCH_API_MAX_RESULTS)
+    fields = get_fields_param(request, RESULT_FIELDS)
+    if archive is None:
+        return json_response({'success': False, 'error': 'No stored results for this query'}, status=404)
+
+    from .scraping import filter_results
+    results = filter_results(archive.results)[:num_results]
+    return json_response({
+        'success': True,
+        'query': archive.query,
+        'engine': archive.engine,
+        'locale': f"{archive.language}-{archive.country}",
+        'fetched_at': archive.created_at,
+        'count': len(results),
+        'results': select_fields(results, fields),
+    })
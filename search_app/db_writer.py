@@ -0,0 +1,164 @@
+import atexit
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .models import SearchQuery
+from .signals import bump_fragment_version
+
+
+class PendingWrite:
+    """Handle for a queued write; wait() blocks until it is committed"""
+
+    def __init__(self, kind, payload):
+        self.kind = kind
+        self.payload = payload
+        self.error = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise TimeoutError("Buffered write was not flushed in time")
+        if self.error is not None:
+            raise self.error
+        return self.payload
+
+    def finish(self, error=None):
+        self.error = error
+        self._done.set()
+
+
+class SearchQueryWriter:
+    """
+    Buffers SearchQuery inserts and deletes and commits them from one
+    background thread (group commit). A write is committed as soon as the
+    writer is idle; writes that arrive while a transaction is running are
+    committed together in the next one, up to max_batch. A lone write pays
+    no added delay, and under load the threads of one process share one
+    short SQLite write transaction instead of one per request.
+    """
+
+    def __init__(self, max_batch=500):
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='search-db-writer', daemon=True)
+                self._thread.start()
+
+    def _submit(self, kind, payload):
+        write = PendingWrite(kind, payload)
+        self._ensure_started()
+        self._queue.put(write)
+        return write
+
+    def create(self, **fields):
+        """Queue a SearchQuery insert; the returned handle's wait() gives the saved row"""
+        return self._submit('create', SearchQuery(**fields))
+
+    def delete_by_file(self, results_file):
+        """Queue deleting the SearchQuery rows for a results file"""
+        return self._submit('delete', results_file)
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far is committed"""
+        return self._submit('flush', None).wait(timeout)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Take whatever queued up during the previous commit, without waiting for more
+            try:
+                while len(batch) < self.max_batch:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        creates = [write for write in batch if write.kind == 'create']
+        deletes = [write for write in batch if write.kind == 'delete']
+        close_old_connections()
+        try:
+            with transaction.atomic():
+                if creates:
+                    # Ids come back from SQLite's RETURNING support
+                    SearchQuery.objects.bulk_create([write.payload for write in creates])
+                if deletes:
+                    SearchQuery.objects.filter(
+                        results_file__in=[write.payload for write in deletes]
+                    ).delete()
+        except Exception as e:
+            # One bad row must not roll back every other request's write
+            print(f"Buffered write error, retrying {len(creates) + len(deletes)} writes one at a time: {e}")
+            self._write_each(creates + deletes)
+        else:
+            for write in creates + deletes:
+                write.finish()
+
+        if creates or deletes:
+            # bulk_create sends no post_save signals, so invalidate here
+            bump_fragment_version()
+        for write in batch:
+            if write.kind == 'flush':
+                write.finish()
+
+    def _write_each(self, writes):
+        """Commit writes in their own transactions, failing only the ones that error"""
+        for write in writes:
+            try:
+                with transaction.atomic():
+                    if write.kind == 'create':
+                        write.payload.pk = None
+                        write.payload.save(force_insert=True)
+                    else:
+                        SearchQuery.objects.filter(results_file=write.payload).delete()
+            except Exception as e:
+                print(f"Buffered write error: {e}")
+                write.finish(e)
+            else:
+                write.finish()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Process-wide writer, or None when write buffering is disabled"""
+    global _writer
+    if not getattr(settings, 'SEARCH_DB_WRITE_BUFFER', False):
+        return None
+
+    with _writer_lock:
+        if _writer is None:
+            _writer = SearchQueryWriter(
+                max_batch=getattr(settings, 'SEARCH_DB_MAX_BATCH', 500),
+            )
+            atexit.register(_writer.flush, 5)
+    return _writer
+
+
+def create_search_query(wait=False, **fields):
+    """Insert a SearchQuery through the write buffer when it is enabled"""
+    writer = get_writer()
+    if writer is None:
+        return SearchQuery.objects.create(**fields)
+
+    write = writer.create(**fields)
+    return write.wait(10) if wait else write.payload
+
+
+def delete_search_queries(results_file):
+    """Delete the SearchQuery rows for a file, waiting for the batch to commit"""
+    writer = get_writer()
+    if writer is None:
+        SearchQuery.objects.filter(results_file=results_file).delete()
+        return
+    writer.delete_by_file(results_file).wait(10)
@@ -0,0 +1,52 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from search_app.proxy_pool import get_proxy_pool
+
+
+class Command(BaseCommand):
+    help = (
+        "Send requests through the configured proxy pool and report per-proxy "
+        "health and overall throughput. Point SEARCH_PROXIES at local stand-in "
+        "proxies and --url at a local server to exercise the pool offline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='https://www.google.com/generate_204')
+        parser.add_argument('--requests', type=int, default=None, help='Defaults to one per proxy')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--timeout', type=int, default=10)
+
+    def handle(self, *args, **options):
+        pool = get_proxy_pool()
+        if pool is None:
+            raise CommandError("No proxies configured (set SEARCH_PROXIES)")
+
+        total = options['requests'] or len(pool.proxies)
+
+        def probe(_):
+            try:
+                pool.get(options['url'], timeout=options['timeout'])
+                return True
+            except requests.RequestException as e:
+                self.stderr.write(f"Request failed: {e}")
+                return False
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+            succeeded = sum(executor.map(probe, range(total)))
+        elapsed = time.monotonic() - started
+
+        for stat in pool.stats():
+            self.stdout.write(
+                f"{stat['url']}: health {stat['health']}, {stat['requests']} requests, "
+                f"{stat['tokens']} tokens left, quarantined for {stat['quarantined_for']}s"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{succeeded}/{total} requests succeeded in {elapsed:.1f}s "
+            f"({total / elapsed if elapsed else 0:.2f} req/s across {len(pool.proxies)} proxies)"
+        ))
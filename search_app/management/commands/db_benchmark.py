@@ -0,0 +1,129 @@
+import multiprocessing
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections
+from django.test import override_settings
+
+from search_app import db_writer
+from search_app.models import SearchQuery
+
+
+def _insert_direct(name):
+    """One autocommit INSERT per row, like a request writing its own row"""
+    SearchQuery.objects.create(query=f"bench {name}", results_file=f"bench_{name}.txt")
+
+
+def _insert_buffered(name):
+    """One row through the process's write buffer, waiting for its commit like views.index"""
+    db_writer.create_search_query(wait=True, query=f"bench {name}", results_file=f"bench_{name}.txt")
+
+
+def _run_requests(insert, worker, thread, count, latencies, errors):
+    """A request-handling thread: one row per request, one request after another"""
+    for i in range(count):
+        started = time.perf_counter()
+        try:
+            insert(f"{worker}-{thread}-{i}")
+        except (OperationalError, TimeoutError):
+            errors.append(1)
+            continue
+        latencies.append(time.perf_counter() - started)
+    connection.close()
+
+
+def _run_worker(mode, worker, threads, count, results):
+    connections.close_all()
+    # The writer is per process; never inherit one from the parent
+    db_writer._writer = None
+    insert = _insert_buffered if mode == 'buffered' else _insert_direct
+    latencies, errors = [], []
+    # Direct mode never touches the buffer, so forcing it on only affects buffered mode
+    with override_settings(SEARCH_DB_WRITE_BUFFER=True):
+        request_threads = [
+            threading.Thread(target=_run_requests, args=(insert, worker, thread, count, latencies, errors))
+            for thread in range(threads)
+        ]
+        for request_thread in request_threads:
+            request_thread.start()
+        for request_thread in request_threads:
+            request_thread.join()
+    results.put((len(errors), latencies))
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure SearchQuery insert throughput and per-write latency with N "
+        "worker processes, each running request-like threads that insert one "
+        "row per request, against a scratch copy of the configured SQLite "
+        "settings. Compares direct inserts with the buffered writer "
+        "(create_search_query(wait=True), as the index view does)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+        parser.add_argument(
+            '--threads', type=int, default=1,
+            help='Request threads per worker (1 matches sync gunicorn workers)',
+        )
+        parser.add_argument('--inserts', type=int, default=200, help='Rows inserted per thread')
+        parser.add_argument('--mode', choices=['direct', 'buffered', 'both'], default='both')
+
+    def handle(self, *args, **options):
+        modes = ['direct', 'buffered'] if options['mode'] == 'both' else [options['mode']]
+        context = multiprocessing.get_context('fork')
+
+        with tempfile.TemporaryDirectory() as scratch:
+            # Same engine and OPTIONS as production, different file
+            connections.close_all()
+            connections['default'].settings_dict['NAME'] = os.path.join(scratch, 'bench.sqlite3')
+            call_command('migrate', verbosity=0)
+
+            for mode in modes:
+                for workers in options['workers']:
+                    SearchQuery.objects.all().delete()
+                    connections.close_all()
+
+                    results = context.Queue()
+                    processes = [
+                        context.Process(
+                            target=_run_worker,
+                            args=(mode, worker, options['threads'], options['inserts'], results),
+                        )
+                        for worker in range(workers)
+                    ]
+                    started = time.perf_counter()
+                    for process in processes:
+                        process.start()
+                    errors = 0
+                    latencies = []
+                    for _ in processes:
+                        worker_errors, worker_latencies = results.get()
+                        errors += worker_errors
+                        latencies.extend(worker_latencies)
+                    for process in processes:
+                        process.join()
+                    elapsed = time.perf_counter() - started
+
+                    rows = SearchQuery.objects.count()
+                    self.stdout.write(
+                        f"{mode:>8} x{workers:<3} {rows} rows in {elapsed:.2f}s "
+                        f"= {rows / elapsed:,.0f} inserts/s, {self._latency(latencies)}, "
+                        f"{errors} errors"
+                    )
+
+    def _latency(self, latencies):
+        """Per-write latency summary in milliseconds"""
+        if len(latencies) < 2:
+            return "latency n/a"
+        cuts = statistics.quantiles(latencies, n=20)
+        return (
+            f"latency p50 {cuts[9] * 1000:.1f}ms p95 {cuts[18] * 1000:.1f}ms "
+            f"max {max(latencies) * 1000:.1f}ms"
+        )
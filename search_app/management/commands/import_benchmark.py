@@ -0,0 +1,81 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# What a worker does before serving its first request
+BOOT_CODE = (
+    "import django; django.setup(); "
+    "from django.urls import get_resolver; get_resolver().url_patterns"
+)
+
+# Modules that should only be imported once a view actually needs them
+HEAVY_MODULES = ('boto3', 'botocore', 'bs4', 'lxml', 'requests', 'storages.backends.s3boto3')
+
+
+def parse_importtime(stderr):
+    """Parse -X importtime output into {module: (self_us, cumulative_us)}"""
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure worker startup time with python -X importtime: boots Django "
+        "and loads the URLconf in fresh interpreters, then reports wall time, "
+        "the slowest imports and any heavy modules pulled in at boot."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--top', type=int, default=15, help='Number of slowest imports to list')
+        parser.add_argument(
+            '--code', default=BOOT_CODE,
+            help='Python code to time instead of the default worker boot',
+        )
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get(
+            'DJANGO_SETTINGS_MODULE', 'searchproject.settings'))
+        command = [sys.executable, '-X', 'importtime', '-c', options['code']]
+
+        wall_times = []
+        timings = {}
+        for _ in range(options['runs']):
+            started = time.perf_counter()
+            completed = subprocess.run(
+                command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+            )
+            wall_times.append(time.perf_counter() - started)
+            if completed.returncode != 0:
+                raise CommandError(f"Boot failed:\n{completed.stderr[-2000:]}")
+            # Keep the last run, earlier ones warm the filesystem cache
+            timings = parse_importtime(completed.stderr)
+
+        total_us = sum(self_us for self_us, _ in timings.values())
+        self.stdout.write(
+            f"Wall time over {options['runs']} runs: median {statistics.median(wall_times) * 1000:.1f} ms, "
+            f"min {min(wall_times) * 1000:.1f} ms"
+        )
+        self.stdout.write(f"Imports: {len(timings)} modules, {total_us / 1000:.1f} ms total")
+
+        self.stdout.write(f"\nSlowest {options['top']} imports (cumulative):")
+        slowest = sorted(timings.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (self_us, cumulative_us) in slowest[:options['top']]:
+            self.stdout.write(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+        loaded = [name for name in HEAVY_MODULES if name in timings]
+        if loaded:
+            self.stdout.write(self.style.WARNING(f"\nHeavy modules imported at boot: {', '.join(loaded)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("\nNo heavy modules imported at boot"))
@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Max
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from search_app import search_cache
+from search_app.models import SearchQuery
+from search_app.scraping import search_web
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh cached results for the most frequent recent queries before "
+        "they expire. Intended to run on a schedule (e.g. cron every 10 minutes)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--budget', type=int,
+            default=getattr(settings, 'SEARCH_PREFETCH_BUDGET', 20),
+            help=(
+                'Maximum number of queries to refresh in this run (a query can take two '
+                'scrapes when Google returns nothing and the Bing fallback runs)'
+            ),
+        )
+        parser.add_argument(
+            '--days', type=int,
+            default=getattr(settings, 'SEARCH_PREFETCH_LOOKBACK_DAYS', 7),
+            help='Only consider queries searched within this many days',
+        )
+        parser.add_argument(
+            '--horizon', type=int, default=900,
+            help='Refresh entries whose fresh TTL runs out within this many seconds',
+        )
+        parser.add_argument(
+            '--num-results', type=int, default=15,
+            help='Result count to prefetch (must match the view that serves it)',
+        )
+
+    def handle(self, *args, **options):
+        budget = options['budget']
+        num_results = options['num_results']
+        refresh_after = search_cache.get_fresh_ttl() - options['horizon']
+        since = timezone.now() - timedelta(days=options['days'])
+
+        popular = (
+            SearchQuery.objects
+            .filter(created_at__gte=since)
+            .annotate(normalized=Lower('query'))
+            .values('normalized')
+            .annotate(hits=Count('id'), last_searched=Max('created_at'))
+            .order_by('-hits', '-last_searched')
+        )
+
+        scraped = 0
+        skipped = 0
+        for row in popular.iterator():
+            if scraped >= budget:
+                break
+
+            query = row['normalized']
+            entry = search_cache.get_entry(query, num_results)
+            if entry is not None and search_cache.entry_age(entry) < refresh_after:
+                skipped += 1
+                continue
+
+            results = search_cache.refresh(query, num_results, search_web)
+            scraped += 1
+            self.stdout.write(f"Prefetched '{query}' ({row['hits']} searches): {len(results)} results")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Prefetch complete: {scraped} refreshed, {skipped} still fresh, budget {budget}"
+        ))
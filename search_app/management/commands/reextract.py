@@ -0,0 +1,111 @@
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import django
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from search_app import search_cache
+from search_app.models import SerpArchive
+
+
+def _init_worker():
+    django.setup()
+
+
+def _parse_page(args):
+    """Re-run the current parser over one archived page (runs in a worker process)"""
+    from search_app.scraping import GoogleSearchScraper, parse_bing_results
+
+    pk, engine, num_results, compressed = args
+    html = zlib.decompress(compressed)
+    if engine == 'bing':
+        return pk, parse_bing_results(html, num_results)
+    return pk, GoogleSearchScraper().parse_results(html, num_results)
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-run the current result parsers over archived raw result pages and "
+        "update the stored results. Makes no network requests."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Only re-extract pages archived within this many days')
+        parser.add_argument('--engine', choices=[c[0] for c in SerpArchive.ENGINE_CHOICES])
+        parser.add_argument('--query', help='Only re-extract pages for this query (case-insensitive)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report what would change without saving anything',
+        )
+
+    def handle(self, *args, **options):
+        archives = SerpArchive.objects.order_by('pk')
+        if options['days']:
+            archives = archives.filter(created_at__gte=timezone.now() - timedelta(days=options['days']))
+        if options['engine']:
+            archives = archives.filter(engine=options['engine'])
+        if options['query']:
+            archives = archives.filter(query__iexact=options['query'])
+
+        pages = archives.values_list('pk', 'engine', 'num_results', 'html')
+        total = archives.count()
+        processed = 0
+        changed = 0
+
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as executor:
+            batch_size = options['batch_size']
+            for start in range(0, total, batch_size):
+                batch = [
+                    (pk, engine, num_results, bytes(html))
+                    for pk, engine, num_results, html in pages[start:start + batch_size]
+                ]
+                parsed = dict(executor.map(_parse_page, batch))
+
+                updated = []
+                for archive in SerpArchive.objects.filter(pk__in=parsed.keys()).defer('html'):
+                    results = parsed[archive.pk]
+                    if results != archive.results:
+                        changed += 1
+                    archive.results = results
+                    archive.results_count = len(results)
+                    archive.reextracted_at = timezone.now()
+                    updated.append(archive)
+
+                if not options['dry_run']:
+                    SerpArchive.objects.bulk_update(updated, ['results', 'results_count', 'reextracted_at'])
+
+                processed += len(batch)
+                self.stdout.write(f"Re-extracted {processed}/{total} pages")
+
+        if not options['dry_run']:
+            self._refresh_cached_results(archives)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Re-extraction complete: {processed} pages, {changed} with changed results"
+            + (" (dry run, nothing saved)" if options['dry_run'] else "")
+        ))
+
+    def _refresh_cached_results(self, archives):
+        """Replace cached results with the newest re-extracted page per query and locale"""
+        from search_app.scraping import filter_results
+
+        seen = set()
+        for archive in archives.order_by('-created_at').defer('html').iterator():
+            key = search_cache.make_cache_key(archive.query, archive.num_results, archive.language, archive.country)
+            results = filter_results(archive.results)
+            if key in seen or not results:
+                continue
+            seen.add(key)
+            search_cache.store_results(
+                archive.query,
+                archive.num_results,
+                results,
+                fetched_at=archive.created_at.timestamp(),
+                language=archive.language,
+                country=archive.country,
+            )
@@ -0,0 +1,48 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from search_app.scraping import parse_locale, search_locales
+
+
+class Command(BaseCommand):
+    help = (
+        "Search one query across several locales concurrently and print the "
+        "results grouped by locale with their cross-locale overlap."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('query')
+        parser.add_argument(
+            '--locale', action='append', dest='locales', required=True,
+            help="Language-country pair such as en-US or de-DE (repeatable)",
+        )
+        parser.add_argument('--num-results', type=int, default=10)
+        parser.add_argument('--json', action='store_true', help='Print the full result as JSON')
+
+    def handle(self, *args, **options):
+        try:
+            locales = [parse_locale(value) for value in options['locales']]
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        started = time.monotonic()
+        data = search_locales(options['query'], locales, num_results=options['num_results'])
+        elapsed = time.monotonic() - started
+
+        if options['json']:
+            self.stdout.write(json.dumps(data, indent=2))
+            return
+
+        overlap = data['overlap']
+        for locale, results in data['locales'].items():
+            self.stdout.write(f"{locale}: {len(results)} results, {len(overlap['unique'][locale])} unique")
+            for result in results:
+                self.stdout.write(f"  {result['title'][:70]}  {result['url']}")
+
+        self.stdout.write(f"\nShared by all locales: {len(overlap['common'])}")
+        for pair, count in sorted(overlap['pairs'].items(), key=lambda item: -item[1]):
+            self.stdout.write(f"  {pair.replace('|', ' & ')}: {count} shared")
+
+        self.stdout.write(self.style.SUCCESS(f"Searched {len(data['locales'])} locales in {elapsed:.1f}s"))
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-19 02:06
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("search_app", "0002_searchquery_created_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SerpArchive",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("query", models.CharField(max_length=200)),
+                (
+                    "engine",
+                    models.CharField(
+                        choices=[("google", "Google"), ("bing", "Bing")], max_length=20
+                    ),
+                ),
+                ("num_results", models.IntegerField(default=10)),
+                ("content_hash", models.CharField(max_length=64, unique=True)),
+                ("html", models.BinaryField()),
+                ("compressed_size", models.IntegerField(default=0)),
+                ("results", models.JSONField(default=list)),
+                ("results_count", models.IntegerField(default=0)),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        db_index=True, default=django.utils.timezone.now
+                    ),
+                ),
+                ("reextracted_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-19 02:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("search_app", "0003_serparchive"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="searchquery",
+            index=models.Index(fields=["-timestamp"], name="searchquery_timestamp_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="searchquery",
+            index=models.Index(
+                fields=["-created_at"], name="searchquery_created_at_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="searchquery",
+            index=models.Index(
+                fields=["results_file"], name="searchquery_results_file_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 02:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("search_app", "0004_searchquery_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="serparchive",
+            name="country",
+            field=models.CharField(default="us", max_length=10),
+        ),
+        migrations.AddField(
+            model_name="serparchive",
+            name="language",
+            field=models.CharField(default="en", max_length=10),
+        ),
+    ]
@@ -1,3 +1,5 @@
+import zlib
+
 from django.db import models
 from django.utils import timezone
 
@@ -12,6 +14,42 @@ class SearchQuery(models.Model):
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['-timestamp'], name='searchquery_timestamp_idx'),
+            models.Index(fields=['-created_at'], name='searchquery_created_at_idx'),
+            models.Index(fields=['results_file'], name='searchquery_results_file_idx'),
+        ]
     
     def __str__(self):
         return f"{self.query} - {self.timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
+
+
+class SerpArchive(models.Model):
+    """Compressed raw results page, kept so results can be re-extracted offline"""
+    ENGINE_CHOICES = [
+        ('google', 'Google'),
+        ('bing', 'Bing'),
+    ]
+
+    query = models.CharField(max_length=200)
+    engine = models.CharField(max_length=20, choices=ENGINE_CHOICES)
+    num_results = models.IntegerField(default=10)
+    language = models.CharField(max_length=10, default='en')
+    country = models.CharField(max_length=10, default='us')
+    content_hash = models.CharField(max_length=64, unique=True)
+    html = models.BinaryField()
+    compressed_size = models.IntegerField(default=0)
+    results = models.JSONField(default=list)
+    results_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    reextracted_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.engine} ({self.language}-{self.country}): {self.query} - {self.created_at.strftime('%Y-%m-%d %H:%M:%S')}"
+
+    def raw_html(self):
+        """Return the decompressed page bytes"""
+        return zlib.decompress(bytes(self.html))
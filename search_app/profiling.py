@@ -0,0 +1,237 @@
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import shutil
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.http import HttpRequest
+
+
+# Only one profile runs at a time per process: tracemalloc is process-wide,
+# and this bounds the overhead when many requests are sampled at once
+_profile_lock = threading.Lock()
+_active = threading.local()
+
+
+def is_enabled():
+    return getattr(settings, 'SEARCH_PROFILING_ENABLED', False)
+
+
+def get_profile_dir():
+    return str(getattr(settings, 'SEARCH_PROFILING_DIR', os.path.join(settings.BASE_DIR, 'profiles')))
+
+
+def should_profile(request=None):
+    """
+    Profile a random sample, plus requests carrying the profiling header when
+    it holds SEARCH_PROFILING_TOKEN or comes from a staff user. With no token
+    configured only staff can force a profile.
+    """
+    header = request.headers.get(getattr(settings, 'SEARCH_PROFILING_HEADER', 'X-Profile')) if request else None
+    if header:
+        token = getattr(settings, 'SEARCH_PROFILING_TOKEN', None)
+        if token and hmac.compare_digest(header.encode(), token.encode()):
+            return True
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated and user.is_staff:
+            return True
+    return random.random() < getattr(settings, 'SEARCH_PROFILING_SAMPLE_RATE', 0.01)
+
+
+class StackSampler:
+    """
+    Samples one thread's Python stack at a fixed interval and counts
+    collapsed stacks ("outer;inner;leaf"), the input format of
+    flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return '\n'.join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+
+class Profile:
+    """cProfile, stack samples and a tracemalloc diff for one call, saved to a directory"""
+
+    def __init__(self, name, path=''):
+        self.name = name
+        self.path = path
+        self.id = f"{time.strftime('%Y%m%d_%H%M%S')}_{name}_{uuid.uuid4().hex[:8]}"
+        self.profiler = cProfile.Profile()
+        self.sampler = StackSampler(
+            threading.get_ident(),
+            getattr(settings, 'SEARCH_PROFILING_STACK_INTERVAL', 0.005),
+        )
+        self.trace_memory = getattr(settings, 'SEARCH_PROFILING_TRACEMALLOC', True)
+        self._started_tracemalloc = False
+
+    def __enter__(self):
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(getattr(settings, 'SEARCH_PROFILING_TRACEMALLOC_DEPTH', 10))
+                self._started_tracemalloc = True
+            self.memory_before = tracemalloc.take_snapshot()
+        self.started = time.perf_counter()
+        self.sampler.start()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.disable()
+        self.sampler.stop()
+        self.duration = time.perf_counter() - self.started
+        memory_after = None
+        if self.trace_memory:
+            memory_after = tracemalloc.take_snapshot()
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+
+        try:
+            self.save(memory_after, error=exc)
+        except Exception as e:
+            print(f"Profile save error: {e}")
+        return False
+
+    def save(self, memory_after, error=None):
+        directory = os.path.join(get_profile_dir(), self.id)
+        os.makedirs(directory, exist_ok=True)
+
+        self.profiler.dump_stats(os.path.join(directory, 'profile.prof'))
+        with open(os.path.join(directory, 'stacks.txt'), 'w') as f:
+            f.write(self.sampler.collapsed())
+
+        if memory_after is not None:
+            stats = memory_after.filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            )).compare_to(self.memory_before, 'lineno')
+            with open(os.path.join(directory, 'memory.txt'), 'w') as f:
+                f.write(f"Peak traced memory: {self.peak_memory / 1024:.1f} KiB\n\n")
+                f.write('\n'.join(str(stat) for stat in stats[:50]))
+
+        with open(os.path.join(directory, 'meta.json'), 'w') as f:
+            json.dump({
+                'id': self.id,
+                'name': self.name,
+                'path': self.path,
+                'duration_ms': round(self.duration * 1000, 2),
+                'stack_samples': sum(self.sampler.samples.values()),
+                'error': repr(error) if error else None,
+                'created_at': time.time(),
+            }, f)
+
+        prune_profiles()
+
+
+def prune_profiles():
+    """Keep only the newest SEARCH_PROFILING_MAX_PROFILES profiles"""
+    keep = getattr(settings, 'SEARCH_PROFILING_MAX_PROFILES', 200)
+    for profile_id in list_profile_ids()[keep:]:
+        shutil.rmtree(os.path.join(get_profile_dir(), profile_id), ignore_errors=True)
+
+
+def list_profile_ids():
+    """Profile directory names, newest first"""
+    directory = get_profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        (name for name in os.listdir(directory) if os.path.isdir(os.path.join(directory, name))),
+        reverse=True,
+    )
+
+
+def load_profile_meta(profile_id):
+    """Metadata for a saved profile, or None"""
+    meta_path = os.path.join(get_profile_dir(), os.path.basename(profile_id), 'meta.json')
+    if not os.path.isfile(meta_path):
+        return None
+    with open(meta_path) as f:
+        return json.load(f)
+
+
+def load_profile(profile_id):
+    """Metadata, top functions and memory report for a saved profile, or None"""
+    profile = load_profile_meta(profile_id)
+    if profile is None:
+        return None
+
+    directory = os.path.join(get_profile_dir(), os.path.basename(profile_id))
+
+    output = io.StringIO()
+    stats = pstats.Stats(os.path.join(directory, 'profile.prof'), stream=output)
+    stats.strip_dirs().sort_stats('cumulative').print_stats(40)
+    profile['stats'] = output.getvalue()
+
+    memory_path = os.path.join(directory, 'memory.txt')
+    if os.path.isfile(memory_path):
+        with open(memory_path) as f:
+            profile['memory'] = f.read()
+    return profile
+
+
+def profiled(name):
+    """
+    Profile a sampled fraction of calls (and requests carrying the profiling
+    header). When profiling is disabled the function is returned undecorated,
+    so there is no per-call overhead.
+    """
+    def decorator(func):
+        if not is_enabled():
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            # Calls nested in a profiled call already show up in its profile
+            if getattr(_active, 'profiling', False):
+                return func(*args, **kwargs)
+
+            request = args[0] if args and isinstance(args[0], HttpRequest) else None
+            if not should_profile(request) or not _profile_lock.acquire(blocking=False):
+                return func(*args, **kwargs)
+
+            _active.profiling = True
+            try:
+                with Profile(name, request.path if request is not None else ''):
+                    return func(*args, **kwargs)
+            finally:
+                _active.profiling = False
+                _profile_lock.release()
+        return wrapper
+    return decorator
@@ -0,0 +1,278 @@
+import contextlib
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class NoProxyAvailable(requests.RequestException):
+    """No proxy had budget left (or all were quarantined) before the timeout"""
+
+
+class ProxyBlocked(requests.RequestException):
+    """Every attempt was answered with a block page"""
+
+
+class Proxy:
+    """One egress proxy with its own token bucket and health state"""
+
+    def __init__(self, url, rate, burst):
+        self.url = url
+        self.rate = rate  # Tokens added per second
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.health = 1.0  # Moving average of request success, 0..1
+        self.failures = 0  # Consecutive failures
+        self.quarantined_until = 0.0
+        self.quarantine_count = 0
+        self.requests = 0
+        self._session = None
+
+    def __repr__(self):
+        return f"<Proxy {self.url} health={self.health:.2f} tokens={self.tokens:.2f}>"
+
+    @property
+    def session(self):
+        """Keep-alive session that routes through this proxy"""
+        if self._session is None:
+            session = requests.Session()
+            session.proxies = {'http': self.url, 'https': self.url}
+            self._session = session
+        return self._session
+
+    def reset_session(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def is_quarantined(self, now):
+        return now < self.quarantined_until
+
+    def seconds_until_token(self, now):
+        if self.is_quarantined(now):
+            return self.quarantined_until - now + max(0.0, 1 - self.tokens) / self.rate
+        return max(0.0, 1 - self.tokens) / self.rate
+
+
+class ProxyPool:
+    """
+    Pool of egress proxies. Each proxy has its own request budget (a token
+    bucket), so total throughput grows with the number of proxies. Requests
+    go to the healthiest proxy with budget left, callers passing the same
+    session_key stick to one proxy, and proxies that get blocked are
+    quarantined with exponential backoff.
+
+    Budgets are tracked per process, so with several workers each worker
+    should be given its share of the rate.
+    """
+
+    def __init__(self, proxies, requests_per_minute=6, burst=2, sticky_seconds=300,
+                 quarantine_seconds=300, max_quarantine_seconds=3600,
+                 max_failures=3, acquire_timeout=30, max_attempts=2):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self.proxies = [Proxy(url, requests_per_minute / 60.0, burst) for url in proxies]
+        self.sticky_seconds = sticky_seconds
+        self.quarantine_seconds = quarantine_seconds
+        self.max_quarantine_seconds = max_quarantine_seconds
+        self.max_failures = max_failures
+        self.acquire_timeout = acquire_timeout
+        self.max_attempts = max_attempts
+        self._sticky = {}  # session_key -> (proxy, expires_at)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            settings.SEARCH_PROXIES,
+            requests_per_minute=getattr(settings, 'SEARCH_PROXY_REQUESTS_PER_MINUTE', 6),
+            burst=getattr(settings, 'SEARCH_PROXY_BURST', 2),
+            sticky_seconds=getattr(settings, 'SEARCH_PROXY_STICKY_SECONDS', 300),
+            quarantine_seconds=getattr(settings, 'SEARCH_PROXY_QUARANTINE_SECONDS', 300),
+            max_quarantine_seconds=getattr(settings, 'SEARCH_PROXY_MAX_QUARANTINE_SECONDS', 3600),
+            max_failures=getattr(settings, 'SEARCH_PROXY_MAX_FAILURES', 3),
+            acquire_timeout=getattr(settings, 'SEARCH_PROXY_ACQUIRE_TIMEOUT', 30),
+            max_attempts=getattr(settings, 'SEARCH_PROXY_MAX_ATTEMPTS', 2),
+        )
+
+    def acquire(self, session_key=None, timeout=None, exclude=()):
+        """Take one request token, waiting for budget if needed"""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                proxy = self._choose(session_key, now, exclude)
+                if proxy is not None and proxy.tokens >= 1:
+                    proxy.tokens -= 1
+                    proxy.requests += 1
+                    if session_key is not None:
+                        self._sticky[session_key] = (proxy, now + self.sticky_seconds)
+                    return proxy
+
+                if proxy is not None:
+                    wait = proxy.seconds_until_token(now)
+                else:
+                    eligible = [p for p in self.proxies if p not in exclude]
+                    wait = min(p.seconds_until_token(now) for p in eligible) if eligible else None
+
+            if wait is None or now + wait > deadline:
+                raise NoProxyAvailable("No proxy has request budget available")
+            time.sleep(wait)
+
+    def _choose(self, session_key, now, exclude=()):
+        """Pick the sticky proxy for this key, else the best one with budget"""
+        for proxy in self.proxies:
+            proxy.refill(now)
+
+        if session_key is not None and session_key in self._sticky:
+            proxy, expires_at = self._sticky[session_key]
+            if expires_at > now and not proxy.is_quarantined(now) and proxy not in exclude:
+                return proxy
+            if expires_at <= now or proxy.is_quarantined(now):
+                del self._sticky[session_key]
+
+        candidates = [
+            p for p in self.proxies
+            if p not in exclude and not p.is_quarantined(now) and p.tokens >= 1
+        ]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda p: p.health * p.tokens)
+
+    def report_success(self, proxy):
+        with self._lock:
+            proxy.health = proxy.health * 0.8 + 0.2
+            proxy.failures = 0
+            proxy.quarantine_count = 0
+
+    def report_failure(self, proxy, blocked=False):
+        """Record a failed request; blocked or repeatedly failing proxies are quarantined"""
+        with self._lock:
+            proxy.health *= 0.8
+            proxy.failures += 1
+            # Requests already in flight when the proxy was quarantined don't extend it
+            if proxy.is_quarantined(time.monotonic()):
+                return
+            if blocked or proxy.failures >= self.max_failures:
+                self._quarantine(proxy)
+
+    def _quarantine(self, proxy):
+        duration = min(self.quarantine_seconds * (2 ** proxy.quarantine_count), self.max_quarantine_seconds)
+        proxy.quarantined_until = time.monotonic() + duration
+        proxy.quarantine_count += 1
+        proxy.failures = 0
+        proxy.reset_session()
+        self._sticky = {key: value for key, value in self._sticky.items() if value[0] is not proxy}
+        print(f"Proxy {proxy.url} quarantined for {duration}s")
+
+    def is_blocked(self, response):
+        """Whether a response is a rate-limit or captcha page rather than results"""
+        return response.status_code in (429, 503) or '/sorry/' in response.url
+
+    def has_untried(self, tried):
+        """Whether a proxy outside `tried` is out of quarantine"""
+        with self._lock:
+            now = time.monotonic()
+            return any(p not in tried and not p.is_quarantined(now) for p in self.proxies)
+
+    def get(self, url, session_key=None, **kwargs):
+        """
+        GET through the pool, retrying on a different proxy if blocked or
+        unreachable. Once no untried proxy is left, the last failure is
+        raised (ProxyBlocked for block pages) rather than waiting for budget.
+        """
+        last_error = None
+        tried = set()
+        for _ in range(self.max_attempts):
+            if tried and not self.has_untried(tried):
+                break
+            proxy = self.acquire(session_key, exclude=tried)
+            tried.add(proxy)
+            try:
+                response = proxy.session.get(url, **kwargs)
+            except (requests.exceptions.ProxyError, requests.ConnectionError, requests.Timeout) as e:
+                self.report_failure(proxy)
+                last_error = e
+                continue
+
+            if self.is_blocked(response):
+                self.report_failure(proxy, blocked=True)
+                last_error = ProxyBlocked(f"Blocked via {proxy.url} ({response.status_code})")
+                continue
+
+            self.report_success(proxy)
+            return response
+
+        raise last_error
+
+    def stats(self):
+        """Snapshot of per-proxy state for monitoring"""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    'url': proxy.url,
+                    'health': round(proxy.health, 3),
+                    'tokens': round(min(proxy.burst, proxy.tokens + (now - proxy.updated) * proxy.rate), 2),
+                    'requests': proxy.requests,
+                    'quarantined_for': round(max(0.0, proxy.quarantined_until - now), 1),
+                }
+                for proxy in self.proxies
+            ]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_proxy_pool():
+    """Return the configured pool, or None when no proxies are configured"""
+    global _pool
+    if not getattr(settings, 'SEARCH_PROXIES', None):
+        return None
+
+    with _pool_lock:
+        if _pool is None:
+            pool_class = import_string(getattr(settings, 'SEARCH_PROXY_POOL_CLASS', 'search_app.proxy_pool.ProxyPool'))
+            _pool = pool_class.from_settings()
+    return _pool
+
+
+_direct_session = None
+
+
+def get_direct_session():
+    """Keep-alive session shared by direct (unproxied) requests across threads"""
+    global _direct_session
+    with _pool_lock:
+        if _direct_session is None:
+            pool_size = getattr(settings, 'SEARCH_HTTP_POOL_SIZE', 10)
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _direct_session = session
+    return _direct_session
+
+
+def fetch_page(url, headers, timeout, pool=None, session_key=None, direct_limiter=None):
+    """
+    GET a results page, through the proxy pool when one is configured.
+    direct_limiter (a context manager) only applies to direct requests;
+    proxied ones are already limited per proxy by the pool's budgets.
+    """
+    pool = pool or get_proxy_pool()
+    if pool is not None:
+        return pool.get(url, session_key=session_key, headers=headers, timeout=timeout)
+    with direct_limiter or contextlib.nullcontext():
+        return get_direct_session().get(url, headers=headers, timeout=timeout)
@@ -0,0 +1,121 @@
+import os
+from datetime import datetime
+
+import boto3
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+def save_results_to_s3(query, results):
+    """Save search results to AWS S3 with enhanced formatting"""
+    try:
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filename = f"search_results/search_{timestamp}_{query.replace(' ', '_')[:50]}.txt"
+        
+        # Create file content
+        content = []
+        content.append(f"Search Query: {query}")
+        content.append(f"Search Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        content.append(f"Number of Results: {len(results)}")
+        content.append(f"Search Engine: Google (with Bing fallback)")
+        content.append("=" * 70)
+        content.append("")
+        
+        for i, result in enumerate(results, 1):
+            content.append(f"Result {i}:")
+            content.append(f"Title: {result.get('title', 'N/A')}")
+            content.append(f"URL: {result.get('url', 'N/A')}")
+            content.append(f"Display URL: {result.get('display_url', 'N/A')}")
+            snippet = result.get('snippet', 'N/A')
+            if len(snippet) > 500:
+                snippet = snippet[:500] + '...'
+            content.append(f"Snippet: {snippet}")
+            content.append("-" * 50)
+            content.append("")
+        
+        file_content = "\n".join(content)
+        
+        # Save to S3 using Django's default storage
+        file_path = default_storage.save(filename, ContentFile(file_content.encode('utf-8')))
+        
+        # Return just the filename for display purposes
+        return os.path.basename(file_path)
+        
+    except Exception as e:
+        print(f"S3 save error: {e}")
+        return None
+
+def get_s3_file_url(filename):
+    """Generate a presigned URL for downloading the file from S3"""
+    try:
+        s3_client = boto3.client(
+            's3',
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+            region_name='us-east-1'  # Update to your bucket region
+        )
+        
+        # Generate presigned URL (valid for 1 hour)
+        file_key = f"search_results/{filename}"
+        url = s3_client.generate_presigned_url(
+            'get_object',
+            # Params={'Bucket': settings.AWS_STORAGE_BUCKET_NAME, 'Key': file_key},
+            ExpiresIn=3600  # 1 hour
+        )
+        return url
+    except Exception as e:
+        print(f"Error generating S3 URL: {e}")
+        return None
+
+def list_s3_search_files():
+    """List all search result files in S3"""
+    try:
+        s3_client = boto3.client(
+            's3',
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+            region_name='us-east-1'  # Update to your bucket region
+        )
+        
+        response = s3_client.list_objects_v2(
+            Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+            Prefix='search_results/',
+            MaxKeys=100
+        )
+        
+        files = []
+        if 'Contents' in response:
+            for obj in response['Contents']:
+                files.append({
+                    'key': obj['Key'],
+                    'filename': os.path.basename(obj['Key']),
+                    'last_modified': obj['LastModified'],
+                    'size': obj['Size']
+                })
+        
+        return sorted(files, key=lambda x: x['last_modified'], reverse=True)
+        
+    except Exception as e:
+        print(f"Error listing S3 files: {e}")
+        return []
+
+def delete_s3_file(filename):
+    """Delete a search result file from S3"""
+    try:
+        s3_client = boto3.client(
+            's3',
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+            region_name='us-east-1'  # Update to your bucket region
+        )
+        
+        file_key = f"search_results/{filename}"
+        s3_client.delete_object(
+            Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+            Key=file_key
+        )
+        return True
+        
+    except Exception as e:
+        print(f"Error deleting S3 file: {e}")
+        return False
@@ -0,0 +1,441 @@
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import requests
+from bs4 import BeautifulSoup
+from django.conf import settings
+
+from . import serp_archive
+from .proxy_pool import fetch_page, get_proxy_pool
+from .profiling import profiled
+
+class GoogleSearchScraper:
+    """Enhanced Google Search scraper using BeautifulSoup"""
+    
+    def __init__(self, proxy_pool=None):
+        # Egress proxies with per-proxy rate budgets (None means direct requests)
+        self.proxy_pool = proxy_pool or get_proxy_pool()
+        
+        # Rotate user agents to avoid detection
+        self.user_agents = [
+            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+            'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+            'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0',
+            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:89.0) Gecko/20100101 Firefox/89.0'
+        ]
+    
+    def get_headers(self, language='en', country='us'):
+        """Get randomized headers"""
+        return {
+            'User-Agent': random.choice(self.user_agents),
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+            'Accept-Language': f'{language}-{country.upper()},{language};q=0.5',
+            'Accept-Encoding': 'gzip, deflate',
+            'DNT': '1',
+            'Connection': 'keep-alive',
+            'Upgrade-Insecure-Requests': '1',
+        }
+    
+    def search_google(self, query, num_results=10, language='en', country='us', session_key=None):
+        """
+        Scrape Google search results. Requests sharing a session_key are
+        kept on the same proxy.
+        """
+        try:
+            # Build Google search URL
+            params = {
+                'q': query,
+                'num': min(num_results, 100),  # Google allows max 100 results per page
+                'hl': language,
+                'gl': country,
+                'start': 0
+            }
+            
+            url = f"https://www.google.com/search?{urlencode(params)}"
+            
+            # Make request with headers
+            response = fetch_page(
+                url, self.get_headers(language, country), timeout=15,
+                pool=self.proxy_pool, session_key=session_key,
+                direct_limiter=engine_limiter('google'),
+            )
+            response.raise_for_status()
+            
+            results = self.parse_results(response.content, num_results)
+            
+            # Keep the raw page so it can be re-parsed offline later
+            serp_archive.archive_serp(
+                'google', query, num_results, response.content, results,
+                language=language, country=country,
+            )
+            
+            return results
+            
+        except requests.RequestException as e:
+            print(f"Request error: {e}")
+            return []
+        except Exception as e:
+            print(f"Search error: {e}")
+            return []
+    
+    def parse_results(self, html, num_results=10):
+        """Parse results out of a raw Google results page"""
+        # Parse with BeautifulSoup
+        soup = BeautifulSoup(html, 'lxml')
+        
+        results = []
+        
+        # Extract search results
+        # Google uses different div classes, so we'll try multiple selectors
+        search_containers = soup.find_all('div', class_='g') or soup.find_all('div', class_='tF2Cxc')
+        
+        for container in search_containers[:num_results]:
+            result = self._extract_result_data(container)
+            if result:
+                results.append(result)
+        
+        # If no results found with primary method, try alternative extraction
+        if not results:
+            results = self._alternative_extraction(soup, num_results)
+        
+        return results
+    
+    def _extract_result_data(self, container):
+        """Extract data from a search result container"""
+        try:
+            result = {}
+            
+            # Extract title and URL
+            title_element = container.find('h3') or container.find('a')
+            if title_element:
+                # Get the link
+                link_element = title_element.find_parent('a') or title_element
+                if link_element and link_element.get('href'):
+                    result['url'] = self._clean_google_url(link_element['href'])
+                
+                result['title'] = title_element.get_text(strip=True)
+            
+            # Extract snippet/description
+            snippet_selectors = [
+                '.VwiC3b',  # Common snippet class
+                '.s3v9rd',  # Alternative snippet class
+                '.st',      # Older snippet class
+                '[data-sncf="1"]',  # Another snippet selector
+            ]
+            
+            snippet = ""
+            for selector in snippet_selectors:
+                snippet_element = container.select_one(selector)
+                if snippet_element:
+                    snippet = snippet_element.get_text(strip=True)
+                    break
+            
+            # If no snippet found, try finding any text content
+            if not snippet:
+                text_divs = container.find_all('div', recursive=True)
+                for div in text_divs:
+                    text = div.get_text(strip=True)
+                    if len(text) > 50 and not text.startswith('http'):
+                        snippet = text[:300] + '...' if len(text) > 300 else text
+                        break
+            
+            result['snippet'] = snippet
+            
+            # Extract displayed URL (breadcrumb)
+            cite_element = container.find('cite') or container.select_one('.UdQCqe')
+            if cite_element:
+                result['display_url'] = cite_element.get_text(strip=True)
+            else:
+                result['display_url'] = result.get('url', '')
+            
+            # Only return if we have at least title and URL
+            if result.get('title') and result.get('url'):
+                return result
+            
+        except Exception as e:
+            print(f"Error extracting result: {e}")
+        
+        return None
+    
+    def _alternative_extraction(self, soup, num_results):
+        """Alternative method to extract search results"""
+        results = []
+        
+        try:
+            # Try to find all links with /url?q= pattern (Google's redirect links)
+            links = soup.find_all('a', href=True)
+            
+            for link in links:
+                href = link.get('href', '')
+                if '/url?q=' in href or href.startswith('http'):
+                    title_element = link.find('h3')
+                    if title_element:
+                        title = title_element.get_text(strip=True)
+                        url = self._clean_google_url(href)
+                        
+                        # Find snippet nearby
+                        snippet = ""
+                        parent = link.find_parent('div', class_='g') or link.find_parent()
+                        if parent:
+                            text_content = parent.get_text(strip=True)
+                            if len(text_content) > len(title):
+                                snippet = text_content[len(title):].strip()[:300]
+                        
+                        if title and url:
+                            results.append({
+                                'title': title,
+                                'url': url,
+                                'snippet': snippet,
+                                'display_url': url
+                            })
+                            
+                            if len(results) >= num_results:
+                                break
+        
+        except Exception as e:
+            print(f"Alternative extraction error: {e}")
+        
+        return results
+    
+    def _clean_google_url(self, url):
+        """Clean Google redirect URLs"""
+        if '/url?q=' in url:
+            # Extract the actual URL from Google's redirect
+            try:
+                from urllib.parse import parse_qs, urlparse
+                parsed = urlparse(url)
+                if parsed.path == '/url':
+                    query_params = parse_qs(parsed.query)
+                    actual_url = query_params.get('q', [''])[0]
+                    return actual_url
+            except:
+                pass
+        
+        # Remove any remaining Google parameters
+        if url.startswith('/'):
+            url = 'https://www.google.com' + url
+        
+        return url
+
+def search_bing(query, num_results=10, language=None, country=None, session_key=None):
+    """Alternative search using Bing (as backup)"""
+    try:
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        }
+        
+        params = {'q': query, 'count': num_results}
+        if language:
+            params['setlang'] = language
+        if country:
+            params['cc'] = country
+        
+        url = f"https://www.bing.com/search?{urlencode(params)}"
+        response = fetch_page(
+            url, headers, timeout=10, session_key=session_key, direct_limiter=engine_limiter('bing'),
+        )
+        results = parse_bing_results(response.content, num_results)
+        
+        serp_archive.archive_serp(
+            'bing', query, num_results, response.content, results,
+            language=language, country=country,
+        )
+        
+        return results
+        
+    except Exception as e:
+        print(f"Bing search error: {e}")
+        return []
+
+def parse_bing_results(html, num_results=10):
+    """Parse results out of a raw Bing results page"""
+    soup = BeautifulSoup(html, 'lxml')
+    
+    results = []
+    search_results = soup.find_all('li', class_='b_algo')
+    
+    for result in search_results[:num_results]:
+        title_element = result.find('h2')
+        if title_element and title_element.find('a'):
+            title = title_element.get_text(strip=True)
+            url = title_element.find('a')['href']
+            
+            snippet_element = result.find('p') or result.find('div', class_='b_caption')
+            snippet = snippet_element.get_text(strip=True) if snippet_element else ""
+            
+            results.append({
+                'title': title,
+                'url': url,
+                'snippet': snippet,
+                'display_url': url
+            })
+    
+    return results
+
+@profiled('search_web')
+def search_web(query, num_results=10, use_bing_fallback=True, language='en', country='us', session_key=None):
+    """
+    Enhanced web search with multiple fallback options. Through a proxy
+    pool, requests for the same query and locale stick to one proxy
+    unless another session_key is given.
+    """
+    session_key = session_key or make_session_key(query, language, country)
+    scraper = GoogleSearchScraper()
+    
+    # Add delay to be respectful to search engines
+    time.sleep(random.uniform(1, 3))
+    
+    # Try Google first
+    results = scraper.search_google(
+        query, num_results, language=language, country=country, session_key=session_key,
+    )
+    
+    # If Google fails and fallback is enabled, try Bing
+    if not results and use_bing_fallback:
+        print("Google search failed, trying Bing...")
+        time.sleep(random.uniform(1, 2))
+        results = search_bing(
+            query, num_results, language=language, country=country, session_key=session_key,
+        )
+    
+    return filter_results(results)
+
+def make_session_key(query, language='en', country='us'):
+    """Proxy session key for a query and locale, ignoring case and extra whitespace"""
+    return f"{language}-{country}:{' '.join(query.lower().split())}".lower()
+
+def filter_results(results):
+    """Filter out low-quality results"""
+    filtered_results = []
+    for result in results:
+        if (result.get('title') and 
+            len(result['title']) > 5 and 
+            result.get('url') and 
+            result['url'].startswith('http')):
+            filtered_results.append(result)
+    
+    return filtered_results
+
+class EngineLimiter:
+    """
+    Caps concurrent direct (unproxied) requests and their rate for one
+    search engine. Up to
+    `burst` requests may start at once, after which starts are spaced to
+    the sustained rate.
+    """
+    
+    def __init__(self, concurrency, requests_per_minute, burst=None):
+        self._semaphore = threading.BoundedSemaphore(concurrency)
+        self._interval = 60.0 / requests_per_minute
+        self._burst_window = ((burst or concurrency) - 1) * self._interval
+        self._next_start = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def __enter__(self):
+        self._semaphore.acquire()
+        # Reserve a start time (generic cell rate algorithm)
+        with self._lock:
+            now = time.monotonic()
+            next_start = max(now, self._next_start)
+            start = max(now, next_start - self._burst_window)
+            self._next_start = next_start + self._interval
+        if start > now:
+            time.sleep(start - now)
+        return self
+    
+    def __exit__(self, *exc_info):
+        self._semaphore.release()
+
+_engine_limiters = {}
+_engine_limiters_lock = threading.Lock()
+
+def engine_limiter(engine):
+    """Shared limiter for an engine, configured by SEARCH_ENGINE_LIMITS"""
+    with _engine_limiters_lock:
+        if engine not in _engine_limiters:
+            limits = getattr(settings, 'SEARCH_ENGINE_LIMITS', {}).get(engine, {})
+            _engine_limiters[engine] = EngineLimiter(
+                limits.get('concurrency', 4),
+                limits.get('requests_per_minute', 30),
+                limits.get('burst'),
+            )
+        return _engine_limiters[engine]
+
+def parse_locale(value):
+    """Parse 'de-DE', 'de_de' or 'de:de' into a ('de', 'de') pair"""
+    parts = value.replace('_', '-').replace(':', '-').lower().split('-')
+    if len(parts) != 2 or not all(part.isalpha() and len(part) in (2, 3) for part in parts):
+        raise ValueError(f"Invalid locale '{value}', expected language-country like 'de-DE'")
+    return parts[0], parts[1]
+
+def search_locales(query, locales, num_results=10, search=None):
+    """
+    Run the same query for several (language, country) pairs concurrently.
+    Requests share pooled connections and the per-engine limits, so as long
+    as the locales fit in the engine burst, wall time is close to that of
+    the slowest locale. `search` defaults to search_web; pass a cached
+    search to serve locales from the result cache. Returns results grouped
+    by locale plus their cross-locale overlap.
+    """
+    search = search or search_web
+    locales = list(dict.fromkeys(locales))
+    max_workers = getattr(settings, 'SEARCH_LOCALE_MAX_WORKERS', 8)
+    
+    def run(locale):
+        language, country = locale
+        return search(query, num_results, language=language, country=country)
+    
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(locales)) or 1) as executor:
+        results = list(executor.map(run, locales))
+    
+    results_by_locale = {
+        f"{language}-{country}": locale_results
+        for (language, country), locale_results in zip(locales, results)
+    }
+    
+    return {
+        'query': query,
+        'locales': results_by_locale,
+        'overlap': compute_overlap(results_by_locale),
+    }
+
+def compute_overlap(results_by_locale):
+    """
+    Cross-locale overlap of result URLs, built in a single pass: which
+    locales each URL appears in, URLs shared by every locale, URLs unique
+    to one locale and the number of shared URLs per locale pair.
+    """
+    locale_names = list(results_by_locale)
+    url_locales = {}
+    pair_counts = {}
+    
+    for locale, results in results_by_locale.items():
+        for result in results:
+            url = result['url']
+            seen_in = url_locales.setdefault(url, [])
+            if locale in seen_in:
+                continue
+            # Every earlier locale holding this URL now shares it with this one
+            for other in seen_in:
+                pair = f"{other}|{locale}"
+                pair_counts[pair] = pair_counts.get(pair, 0) + 1
+            seen_in.append(locale)
+    
+    unique = {locale: [] for locale in locale_names}
+    common = []
+    for url, seen_in in url_locales.items():
+        if len(seen_in) == 1:
+            unique[seen_in[0]].append(url)
+        if len(seen_in) == len(locale_names):
+            common.append(url)
+    
+    return {
+        'urls': url_locales,
+        'common': common,
+        'unique': unique,
+        'pairs': pair_counts,
+    }
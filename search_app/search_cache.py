@@ -0,0 +1,108 @@
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections
+
+
+# Background refreshes run on a small shared pool so a burst of stale hits
+# never turns into a burst of scrapes
+_refresh_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'SEARCH_CACHE_REFRESH_WORKERS', 2),
+    thread_name_prefix='search-refresh',
+)
+
+
+def get_cache():
+    """Cache holding search results, kept apart so they don't evict page fragments"""
+    return caches[getattr(settings, 'SEARCH_CACHE_ALIAS', 'search_results')]
+
+
+def get_fresh_ttl():
+    """Seconds a cached result is served without revalidation"""
+    return getattr(settings, 'SEARCH_CACHE_TTL', 3600)
+
+
+def get_stale_ttl():
+    """Seconds past the fresh TTL an expired result may still be served"""
+    return getattr(settings, 'SEARCH_CACHE_STALE_TTL', 86400)
+
+
+def make_cache_key(query, num_results, language='en', country='us'):
+    """Build a cache key for a query and locale, ignoring case and extra whitespace"""
+    normalized = ' '.join(query.lower().split())
+    locale = f"{language}-{country}".lower()
+    digest = hashlib.sha1(f"{normalized}|{num_results}|{locale}".encode('utf-8')).hexdigest()
+    return f"search_results:{digest}"
+
+
+def get_entry(query, num_results, language='en', country='us'):
+    """Return the cached entry for a query, or None"""
+    return get_cache().get(make_cache_key(query, num_results, language, country))
+
+
+def entry_age(entry):
+    """Seconds since the entry was fetched"""
+    return time.time() - entry['fetched_at']
+
+
+def store_results(query, num_results, results, fetched_at=None, language='en', country='us'):
+    """Cache results for the fresh TTL plus the stale window"""
+    entry = {'results': results, 'fetched_at': fetched_at or time.time()}
+    timeout = get_fresh_ttl() + get_stale_ttl() - entry_age(entry)
+    if timeout <= 0:
+        return None
+
+    get_cache().set(make_cache_key(query, num_results, language, country), entry, timeout=timeout)
+    return entry
+
+
+def refresh(query, num_results, fetch, language='en', country='us'):
+    """Fetch results now and cache them (empty results are not cached)"""
+    results = fetch(query, num_results, language=language, country=country)
+    if results:
+        store_results(query, num_results, results, language=language, country=country)
+    return results
+
+
+def refresh_in_background(query, num_results, fetch, language='en', country='us'):
+    """
+    Schedule a refresh unless one is already running for this query.
+    Returns True if a refresh was scheduled.
+    """
+    lock_key = make_cache_key(query, num_results, language, country) + ':refreshing'
+    if not get_cache().add(lock_key, True, timeout=getattr(settings, 'SEARCH_CACHE_REFRESH_LOCK_TTL', 120)):
+        return False
+
+    def run():
+        try:
+            refresh(query, num_results, fetch, language, country)
+        except Exception as e:
+            print(f"Background refresh error: {e}")
+        finally:
+            get_cache().delete(lock_key)
+            # Refreshes archive pages, so release this thread's connection
+            close_old_connections()
+
+    _refresh_executor.submit(run)
+    return True
+
+
+def get_or_revalidate(query, num_results, fetch, language='en', country='us'):
+    """
+    Stale-while-revalidate lookup: fresh entries are returned as is, stale
+    entries are returned immediately and refreshed in the background, and
+    misses are fetched synchronously.
+    """
+    entry = get_entry(query, num_results, language, country)
+    if entry is not None:
+        age = entry_age(entry)
+        if age < get_fresh_ttl():
+            return entry['results']
+        if age < get_fresh_ttl() + get_stale_ttl():
+            refresh_in_background(query, num_results, fetch, language, country)
+            return entry['results']
+
+    return refresh(query, num_results, fetch, language, country)
@@ -0,0 +1,76 @@
+import hashlib
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import SerpArchive
+
+
+def is_enabled():
+    return getattr(settings, 'SERP_ARCHIVE_ENABLED', True)
+
+
+def archive_serp(engine, query, num_results, html, results, language='en', country='us'):
+    """
+    Store a compressed copy of a raw results page for one locale. Identical pages are
+    stored once, oversized pages are skipped, and the archive is pruned
+    to its retention window and total size cap. Never raises.
+    """
+    if not is_enabled() or not html:
+        return None
+
+    try:
+        content_hash = hashlib.sha256(html).hexdigest()
+        existing = SerpArchive.objects.filter(content_hash=content_hash).first()
+        if existing:
+            return existing
+
+        compressed = zlib.compress(html, getattr(settings, 'SERP_ARCHIVE_COMPRESSION_LEVEL', 6))
+        if len(compressed) > getattr(settings, 'SERP_ARCHIVE_MAX_PAGE_BYTES', 512 * 1024):
+            print(f"SERP archive: skipping {engine} page for '{query}' ({len(compressed)} bytes)")
+            return None
+
+        archive = SerpArchive.objects.create(
+            query=query,
+            engine=engine,
+            num_results=num_results,
+            language=(language or 'en').lower(),
+            country=(country or 'us').lower(),
+            content_hash=content_hash,
+            html=compressed,
+            compressed_size=len(compressed),
+            results=results,
+            results_count=len(results),
+        )
+        prune_archive()
+        return archive
+
+    except Exception as e:
+        print(f"SERP archive error: {e}")
+        return None
+
+
+def prune_archive():
+    """Delete pages past retention, then the oldest pages over the size cap"""
+    retention_days = getattr(settings, 'SERP_ARCHIVE_RETENTION_DAYS', 30)
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    deleted, _ = SerpArchive.objects.filter(created_at__lt=cutoff).delete()
+
+    max_total = getattr(settings, 'SERP_ARCHIVE_MAX_TOTAL_BYTES', 200 * 1024 * 1024)
+    total = SerpArchive.objects.aggregate(total=Sum('compressed_size'))['total'] or 0
+    if total <= max_total:
+        return deleted
+
+    # Walk from the oldest page until enough space is reclaimed
+    to_delete = []
+    for pk, size in SerpArchive.objects.order_by('created_at').values_list('pk', 'compressed_size').iterator():
+        if total <= max_total:
+            break
+        to_delete.append(pk)
+        total -= size
+
+    more, _ = SerpArchive.objects.filter(pk__in=to_delete).delete()
+    return deleted + more
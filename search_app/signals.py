@@ -0,0 +1,30 @@
+import time
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import SearchQuery
+
+
+# Cached recent-searches and history fragments are keyed on this version,
+# so bumping it on any write makes the next render rebuild them. It is a
+# nanosecond timestamp rather than a counter so that a lost or evicted key
+# can never bring back a version that old fragments are still cached under.
+FRAGMENT_VERSION_KEY = 'search_query_fragment_version'
+
+
+def get_fragment_version():
+    """Current version of the SearchQuery fragments"""
+    return cache.get_or_set(FRAGMENT_VERSION_KEY, time.time_ns, timeout=None)
+
+
+def bump_fragment_version():
+    """Invalidate every cached SearchQuery fragment"""
+    cache.set(FRAGMENT_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+@receiver(post_save, sender=SearchQuery)
+@receiver(post_delete, sender=SearchQuery)
+def invalidate_search_query_fragments(sender, **kwargs):
+    bump_fragment_version()
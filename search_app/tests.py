@@ -1,3 +1,577 @@
-from django.test import TestCase
+import io
+import json
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import api, profiling, scraping, search_cache, serp_archive, signals, views
+from .db_writer import PendingWrite, SearchQueryWriter
+from .management.commands.reextract import Command as ReextractCommand
+from .models import SearchQuery, SerpArchive
+from .proxy_pool import NoProxyAvailable, ProxyBlocked, ProxyPool, fetch_page
+
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'search_results': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'search_results',
+    },
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FragmentVersionTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_changes_version(self):
+        before = signals.get_fragment_version()
+        signals.bump_fragment_version()
+        self.assertNotEqual(signals.get_fragment_version(), before)
+
+    def test_lost_key_never_reuses_a_version(self):
+        seen = {signals.get_fragment_version()}
+        for _ in range(3):
+            signals.bump_fragment_version()
+            seen.add(signals.get_fragment_version())
+            # An evicted or expired key must not restart at an old value
+            cache.delete(signals.FRAGMENT_VERSION_KEY)
+            seen.add(signals.get_fragment_version())
+        self.assertEqual(len(seen), 7)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SearchCacheTests(SimpleTestCase):
+    def setUp(self):
+        search_cache.get_cache().clear()
+
+    def test_results_are_kept_out_of_the_default_cache(self):
+        search_cache.store_results('python', 10, [{'url': 'https://python.org'}])
+        self.assertIsNotNone(search_cache.get_entry('Python', 10))
+        self.assertIsNone(cache.get(search_cache.make_cache_key('python', 10)))
+
+    def test_fresh_entry_is_served_without_fetching(self):
+        search_cache.store_results('python', 10, [{'url': 'https://python.org'}])
+        fetch = mock.Mock(side_effect=AssertionError('fresh entry should not be refetched'))
+        results = search_cache.get_or_revalidate('python', 10, fetch)
+        self.assertEqual(results, [{'url': 'https://python.org'}])
+
+    def test_miss_is_fetched_and_cached(self):
+        fetch = mock.Mock(return_value=[{'url': 'https://python.org'}])
+        results = search_cache.get_or_revalidate('python', 10, fetch)
+        self.assertEqual(results, [{'url': 'https://python.org'}])
+        fetch.assert_called_once_with('python', 10, language='en', country='us')
+        self.assertEqual(search_cache.get_entry('python', 10)['results'], results)
+
+    def test_empty_results_are_not_cached(self):
+        search_cache.get_or_revalidate('python', 10, mock.Mock(return_value=[]))
+        self.assertIsNone(search_cache.get_entry('python', 10))
+
+    def test_stale_entry_is_served_and_refreshed_once_in_background(self):
+        stale_at = time.time() - search_cache.get_fresh_ttl() - 1
+        search_cache.store_results('python', 10, [{'url': 'https://old.example'}], fetched_at=stale_at)
+        fetch = mock.Mock(return_value=[{'url': 'https://new.example'}])
+
+        with mock.patch.object(search_cache._refresh_executor, 'submit') as submit:
+            for _ in range(2):
+                results = search_cache.get_or_revalidate('python', 10, fetch)
+                self.assertEqual(results, [{'url': 'https://old.example'}])
+        # The refresh lock keeps the second stale hit from scheduling another scrape
+        submit.assert_called_once()
+        fetch.assert_not_called()
+
+        submit.call_args.args[0]()
+        fetch.assert_called_once_with('python', 10, language='en', country='us')
+        self.assertEqual(search_cache.get_entry('python', 10)['results'], [{'url': 'https://new.example'}])
+        lock_key = search_cache.make_cache_key('python', 10) + ':refreshing'
+        self.assertIsNone(search_cache.get_cache().get(lock_key))
+
+    def test_entry_past_the_stale_window_is_fetched(self):
+        # Written directly, store_results would not keep an entry this old
+        expired_at = time.time() - search_cache.get_fresh_ttl() - search_cache.get_stale_ttl() - 1
+        search_cache.get_cache().set(
+            search_cache.make_cache_key('python', 10),
+            {'results': [{'url': 'https://old.example'}], 'fetched_at': expired_at},
+        )
+        fetch = mock.Mock(return_value=[{'url': 'https://new.example'}])
+        self.assertEqual(search_cache.get_or_revalidate('python', 10, fetch), [{'url': 'https://new.example'}])
+
+    def test_locales_are_cached_separately(self):
+        search_cache.store_results('python', 10, [{'url': 'https://python.org'}])
+        search_cache.store_results('python', 10, [{'url': 'https://python.de'}], language='de', country='de')
+        self.assertEqual(search_cache.get_entry('python', 10)['results'], [{'url': 'https://python.org'}])
+        self.assertEqual(
+            search_cache.get_entry('python', 10, 'DE', 'DE')['results'],
+            [{'url': 'https://python.de'}],
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PrefetchSearchesTests(TestCase):
+    def setUp(self):
+        search_cache.get_cache().clear()
+        for query, hits in (('python', 3), ('django', 2), ('flask', 1)):
+            for i in range(hits):
+                SearchQuery.objects.create(query=query.title() if i else query, results_file=f"{query}_{i}.txt")
+
+    def prefetch(self, *args):
+        search_web = mock.Mock(side_effect=lambda query, *args, **kwargs: [{'url': f"https://{query}.example"}])
+        with mock.patch('search_app.management.commands.prefetch_searches.search_web', search_web):
+            call_command('prefetch_searches', *args, stdout=io.StringIO())
+        return [call.args[0] for call in search_web.call_args_list]
+
+    def test_budget_refreshes_the_most_searched_queries(self):
+        self.assertEqual(self.prefetch('--budget', '2'), ['python', 'django'])
+        self.assertIsNotNone(search_cache.get_entry('python', 15))
+        self.assertIsNone(search_cache.get_entry('flask', 15))
+
+    def test_entries_fresh_past_the_horizon_are_skipped(self):
+        search_cache.store_results('python', 15, [{'url': 'https://python.example'}])
+        self.assertEqual(self.prefetch('--horizon', '900'), ['django', 'flask'])
+
+    def test_entries_expiring_within_the_horizon_are_refreshed(self):
+        almost_stale = time.time() - search_cache.get_fresh_ttl() + 60
+        search_cache.store_results('python', 15, [{'url': 'https://python.example'}], fetched_at=almost_stale)
+        self.assertEqual(self.prefetch('--horizon', '900'), ['python', 'django', 'flask'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SerpArchiveLocaleTests(TestCase):
+    def setUp(self):
+        search_cache.get_cache().clear()
+        for language, country, url in (('en', 'us', 'https://python.org'), ('de', 'de', 'https://python.de')):
+            SerpArchive.objects.create(
+                query='python', engine='google', language=language, country=country,
+                content_hash=language, html=b'', results=[{'title': 'Python', 'url': url}], results_count=1,
+            )
+
+    def test_stored_results_filter_on_locale(self):
+        factory = RequestFactory()
+        default = json.loads(api.stored_results(factory.get('/', {'q': 'python'})).content)
+        german = json.loads(api.stored_results(factory.get('/', {'q': 'python', 'locale': 'de-DE'})).content)
+        self.assertEqual(default['results'][0]['url'], 'https://python.org')
+        self.assertEqual(german['results'][0]['url'], 'https://python.de')
+        self.assertEqual(german['locale'], 'de-de')
+
+    def test_reextract_refreshes_each_locale_cache_entry(self):
+        ReextractCommand()._refresh_cached_results(SerpArchive.objects.all())
+        self.assertEqual(search_cache.get_entry('python', 10)['results'][0]['url'], 'https://python.org')
+        self.assertEqual(search_cache.get_entry('python', 10, 'de', 'de')['results'][0]['url'], 'https://python.de')
+
+
+GOOGLE_PAGE = b"""<html><body>
+<div class="g"><a href="https://docs.python.org/3/"><h3>Python 3 documentation</h3></a>
+<div class="VwiC3b">The official Python documentation.</div><cite>docs.python.org</cite></div>
+<div class="g"><a href="https://pypi.org/"><h3>Python Package Index</h3></a>
+<div class="VwiC3b">Find, install and publish Python packages.</div><cite>pypi.org</cite></div>
+</body></html>"""
+
+BING_PAGE = b"""<html><body><ol>
+<li class="b_algo"><h2><a href="https://www.python.org/">Welcome to Python.org</a></h2><p>The official home.</p></li>
+</ol></body></html>"""
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SERP_ARCHIVE_ENABLED=True)
+class SerpArchiveTests(TestCase):
+    def test_identical_pages_are_stored_once(self):
+        first = serp_archive.archive_serp('google', 'python', 10, GOOGLE_PAGE, [])
+        second = serp_archive.archive_serp('google', 'python docs', 10, GOOGLE_PAGE, [])
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(SerpArchive.objects.count(), 1)
+        self.assertEqual(first.raw_html(), GOOGLE_PAGE)
+        self.assertLess(first.compressed_size, len(GOOGLE_PAGE))
+
+    def test_oversized_pages_are_skipped(self):
+        with self.settings(SERP_ARCHIVE_MAX_PAGE_BYTES=10):
+            self.assertIsNone(serp_archive.archive_serp('google', 'python', 10, GOOGLE_PAGE, []))
+        self.assertFalse(SerpArchive.objects.exists())
+
+    def test_prune_drops_pages_past_retention(self):
+        old = serp_archive.archive_serp('google', 'python', 10, GOOGLE_PAGE, [])
+        new = serp_archive.archive_serp('bing', 'python', 10, BING_PAGE, [])
+        SerpArchive.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=31))
+        with self.settings(SERP_ARCHIVE_RETENTION_DAYS=30):
+            serp_archive.prune_archive()
+        self.assertEqual(list(SerpArchive.objects.values_list('pk', flat=True)), [new.pk])
+
+    def test_prune_drops_oldest_pages_over_the_size_cap(self):
+        pages = [
+            serp_archive.archive_serp('google', 'python', 10, GOOGLE_PAGE + str(i).encode(), [])
+            for i in range(3)
+        ]
+        for age, page in zip((3, 2, 1), pages):
+            SerpArchive.objects.filter(pk=page.pk).update(created_at=timezone.now() - timedelta(hours=age))
+        with self.settings(SERP_ARCHIVE_MAX_TOTAL_BYTES=pages[1].compressed_size + pages[2].compressed_size):
+            serp_archive.prune_archive()
+        self.assertEqual(
+            set(SerpArchive.objects.values_list('pk', flat=True)),
+            {pages[1].pk, pages[2].pk},
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SERP_ARCHIVE_ENABLED=True)
+class ReextractTests(TestCase):
+    def setUp(self):
+        search_cache.get_cache().clear()
+        # Archived with an older parser that found nothing
+        self.google = serp_archive.archive_serp('google', 'python', 10, GOOGLE_PAGE, [])
+        self.bing = serp_archive.archive_serp('bing', 'python org', 10, BING_PAGE, [])
+
+    def reextract(self, *args):
+        call_command('reextract', '--workers', '1', *args, stdout=io.StringIO())
+
+    def test_reextract_reparses_archived_pages(self):
+        self.reextract()
+        google = SerpArchive.objects.get(pk=self.google.pk)
+        self.assertEqual(
+            [result['url'] for result in google.results],
+            ['https://docs.python.org/3/', 'https://pypi.org/'],
+        )
+        self.assertEqual(google.results_count, 2)
+        self.assertIsNotNone(google.reextracted_at)
+        bing = SerpArchive.objects.get(pk=self.bing.pk)
+        self.assertEqual(bing.results[0]['url'], 'https://www.python.org/')
+        self.assertEqual(search_cache.get_entry('python', 10)['results'], google.results)
+
+    def test_dry_run_saves_nothing(self):
+        self.reextract('--dry-run')
+        google = SerpArchive.objects.get(pk=self.google.pk)
+        self.assertEqual(google.results, [])
+        self.assertIsNone(google.reextracted_at)
+        self.assertIsNone(search_cache.get_entry('python', 10))
+
+
+class StandInProxyHandler(BaseHTTPRequestHandler):
+    """
+    Answers proxied requests itself instead of forwarding them, so the pool
+    can be exercised without network access. `mode` is 'ok', '429' or
+    'sorry' (redirect to a captcha page, like Google's /sorry/).
+    """
+
+    def do_GET(self):
+        mode = self.server.mode
+        if mode == '429':
+            self.send_response(429)
+            body = b'Too Many Requests'
+        elif mode == 'sorry' and '/sorry/' not in self.path:
+            self.send_response(302)
+            self.send_header('Location', 'http://search.test/sorry/index')
+            body = b''
+        else:
+            self.send_response(200)
+            body = self.server.name.encode()
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ProxyPoolTests(SimpleTestCase):
+    URL = 'http://search.test/search?q=python'
+
+    def setUp(self):
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def start_proxy(self, name, mode='ok'):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StandInProxyHandler)
+        server.name = name
+        server.mode = mode
+        self.servers.append(server)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{server.server_port}"
+
+    def make_pool(self, modes, **kwargs):
+        proxies = [self.start_proxy(f"proxy{i}", mode) for i, mode in enumerate(modes)]
+        return ProxyPool(proxies, **kwargs)
+
+    def test_token_budget_limits_requests_per_proxy(self):
+        pool = self.make_pool(['ok'], requests_per_minute=60, burst=2, acquire_timeout=0)
+        for _ in range(2):
+            self.assertEqual(pool.get(self.URL, timeout=5).text, 'proxy0')
+        with self.assertRaises(NoProxyAvailable):
+            pool.get(self.URL, timeout=5)
+
+    def test_session_key_sticks_to_one_proxy(self):
+        pool = self.make_pool(['ok', 'ok', 'ok'], burst=10)
+        served = {pool.get(self.URL, session_key='user-1', timeout=5).text for _ in range(5)}
+        self.assertEqual(len(served), 1)
+
+    def test_rate_limited_proxy_is_quarantined(self):
+        pool = self.make_pool(['429', 'ok'], burst=10)
+        pool.proxies[1].health = 0.5  # Make the failing proxy the first choice
+        self.assertEqual(pool.get(self.URL, timeout=5).text, 'proxy1')
+        stats = pool.stats()
+        self.assertGreater(stats[0]['quarantined_for'], 0)
+        self.assertEqual(stats[1]['quarantined_for'], 0)
+
+    def test_captcha_redirect_is_quarantined(self):
+        pool = self.make_pool(['sorry', 'ok'], burst=10)
+        pool.proxies[1].health = 0.5
+        self.assertEqual(pool.get(self.URL, timeout=5).text, 'proxy1')
+        self.assertGreater(pool.stats()[0]['quarantined_for'], 0)
+
+    def test_all_proxies_blocked_raises_proxy_blocked(self):
+        pool = self.make_pool(['429', 'sorry'], burst=10, max_attempts=3, acquire_timeout=0)
+        with self.assertRaises(ProxyBlocked):
+            pool.get(self.URL, timeout=5)
+        # Nothing is left to try, so later calls fail fast on budget
+        with self.assertRaises(NoProxyAvailable):
+            pool.get(self.URL, timeout=5)
+
+    def test_max_attempts_must_allow_one_request(self):
+        with self.assertRaises(ValueError):
+            ProxyPool(['http://127.0.0.1:1'], max_attempts=0)
+
+    def test_search_web_passes_a_session_key_per_query_and_locale(self):
+        response = mock.Mock(content=b'<html></html>')
+        with mock.patch.object(scraping, 'fetch_page', return_value=response) as fetch, \
+                mock.patch.object(scraping.time, 'sleep'), \
+                mock.patch.object(scraping.serp_archive, 'archive_serp'):
+            for query in ('Python', ' python ', 'python'):
+                scraping.search_web(query)
+            scraping.search_web('python', language='de', country='de')
+        keys = [call.kwargs['session_key'] for call in fetch.call_args_list]
+        # Google then the Bing fallback per search, all on the query's key
+        self.assertEqual(set(keys[:6]), {'en-us:python'})
+        self.assertEqual(set(keys[6:]), {'de-de:python'})
+
+    def test_engine_limiter_only_applies_to_direct_requests(self):
+        limiter = mock.MagicMock()
+        pool = self.make_pool(['ok'], burst=10)
+        self.assertEqual(fetch_page(self.URL, {}, 5, pool=pool, direct_limiter=limiter).text, 'proxy0')
+        limiter.__enter__.assert_not_called()
+
+        with mock.patch('search_app.proxy_pool.get_proxy_pool', return_value=None), \
+                mock.patch('search_app.proxy_pool.get_direct_session') as session:
+            fetch_page(self.URL, {}, 5, direct_limiter=limiter)
+        limiter.__enter__.assert_called_once()
+        session.return_value.get.assert_called_once()
+
+    def test_throughput_grows_with_proxy_count(self):
+        def elapsed(proxy_count, requests=9):
+            pool = self.make_pool(['ok'] * proxy_count, requests_per_minute=600, burst=1)
+            started = time.perf_counter()
+            for _ in range(requests):
+                pool.get(self.URL, timeout=5)
+            return time.perf_counter() - started
+
+        # 10 requests/s per proxy: ~0.8s through one proxy, ~0.2s through three
+        self.assertLess(elapsed(3) * 2, elapsed(1))
+
+
+class ApiTests(SimpleTestCase):
+    def test_accepted_encodings_skip_q_zero(self):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='br;q=0, gzip;q=0.5, deflate')
+        self.assertEqual(api.accepted_encodings(request), {'gzip', 'deflate'})
+
+    def test_refused_encoding_is_not_used(self):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='br;q=0, gzip;q=0')
+        view = api.compress_response(lambda request: api.json_response({'data': 'x' * 1000}))
+        self.assertFalse(view(request).has_header('Content-Encoding'))
+
+    def test_encoders_format_datetimes_alike(self):
+        data = {'at': datetime(2025, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc), 'on': date(2025, 1, 2)}
+        with_orjson = api.json_response(data).content
+        with mock.patch.object(api, 'orjson', None):
+            without_orjson = api.json_response(data).content
+        self.assertEqual(json.loads(with_orjson), json.loads(without_orjson))
+        self.assertEqual(json.loads(with_orjson)['at'], '2025-01-02T03:04:05.678Z')
+
+    def test_search_shares_one_fetch_across_result_counts(self):
+        results = [{'title': str(i), 'url': f"https://example.com/{i}"} for i in range(100)]
+        with mock.patch.object(api, 'cached_search_web', return_value=results) as search:
+            for num in (1, 10, 50):
+                request = RequestFactory().get('/api/v1/search/', {'q': 'python', 'num': num})
+                self.assertEqual(json.loads(api.search(request).content)['count'], num)
+        self.assertEqual(
+            {call.kwargs['num_results'] for call in search.call_args_list},
+            {settings.SEARCH_API_MAX_RESULTS},
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SearchLocalesApiTests(SimpleTestCase):
+    def test_locales_are_served_from_the_result_cache(self):
+        search_cache.get_cache().clear()
+        for language, country, urls in (('en', 'us', 'ab'), ('de', 'de', 'ac')):
+            search_cache.store_results(
+                'python', settings.SEARCH_API_MAX_RESULTS,
+                [{'title': url, 'url': f"https://{url}"} for url in urls],
+                language=language, country=country,
+            )
+        request = RequestFactory().get('/', {'q': 'python', 'locales': 'en-US,de-DE', 'num': 1})
+        with mock.patch.object(scraping, 'search_web', side_effect=AssertionError('cached locale was scraped')):
+            data = json.loads(api.search_locales(request).content)
+        self.assertEqual(data['locales']['en-us'], [{'title': 'a', 'url': 'https://a', 'snippet': None, 'display_url': None}])
+        self.assertEqual(data['overlap']['common'], ['https://a'])
+
+
+class FakeClock:
+    """Stands in for time.monotonic/time.sleep; sleeping advances the clock"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class LocaleSearchTests(SimpleTestCase):
+    def test_parse_locale(self):
+        self.assertEqual(scraping.parse_locale('de-DE'), ('de', 'de'))
+        self.assertEqual(scraping.parse_locale('pt_BR'), ('pt', 'br'))
+        self.assertEqual(scraping.parse_locale('en:us'), ('en', 'us'))
+        for value in ('de', 'de-DE-x', 'd1-de', 'english-us'):
+            with self.assertRaises(ValueError):
+                scraping.parse_locale(value)
+
+    def test_limiter_spaces_starts_after_burst(self):
+        clock = FakeClock()
+        with mock.patch.object(scraping, 'time', clock):
+            limiter = scraping.EngineLimiter(concurrency=10, requests_per_minute=60, burst=3)
+            starts = []
+            for _ in range(6):
+                with limiter:
+                    starts.append(clock.now)
+        # Three start at once, the rest one interval (1s) apart
+        self.assertEqual(starts, [0.0, 0.0, 0.0, 1.0, 2.0, 3.0])
+
+    def test_limiter_caps_concurrency(self):
+        limiter = scraping.EngineLimiter(concurrency=2, requests_per_minute=6000, burst=10)
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def run():
+            with limiter:
+                with lock:
+                    running.append(1)
+                    peak.append(len(running))
+                time.sleep(0.05)
+                with lock:
+                    running.pop()
+
+        threads = [threading.Thread(target=run) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(max(peak), 2)
+
+    def test_compute_overlap(self):
+        def results(*urls):
+            return [{'url': f"https://{url}"} for url in urls]
+
+        overlap = scraping.compute_overlap({
+            'en-us': results('a', 'b', 'c', 'a'),
+            'de-de': results('a', 'b', 'd'),
+            'fr-fr': results('a', 'e'),
+        })
+        self.assertEqual(overlap['common'], ['https://a'])
+        self.assertEqual(overlap['unique'], {
+            'en-us': ['https://c'],
+            'de-de': ['https://d'],
+            'fr-fr': ['https://e'],
+        })
+        self.assertEqual(overlap['pairs'], {'en-us|de-de': 2, 'en-us|fr-fr': 1, 'de-de|fr-fr': 1})
+        self.assertEqual(overlap['urls']['https://b'], ['en-us', 'de-de'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SearchQueryWriterTests(TransactionTestCase):
+    def test_failed_row_does_not_roll_back_the_batch(self):
+        good = [
+            PendingWrite('create', SearchQuery(query=f"query {i}", results_file=f"file_{i}.txt"))
+            for i in range(3)
+        ]
+        bad = PendingWrite('create', SearchQuery(query=None, results_file='bad.txt'))  # NOT NULL violation
+        SearchQueryWriter()._write_batch(good + [bad])
+
+        for write in good:
+            self.assertIsNotNone(write.wait(0).pk)
+        with self.assertRaises(Exception):
+            bad.wait(0)
+        self.assertEqual(SearchQuery.objects.count(), 3)
+
+    def test_writes_queued_during_a_commit_form_the_next_batch(self):
+        writer = SearchQueryWriter()
+        batches = []
+
+        def record(batch):
+            batches.append(len(batch))
+            for write in batch:
+                write.finish()
+
+        # Queued before the writer thread starts, as if a commit were running
+        writes = [PendingWrite('create', SearchQuery(query='q', results_file=f"{i}.txt")) for i in range(3)]
+        writes.append(PendingWrite('flush', None))
+        for write in writes:
+            writer._queue.put(write)
+        with mock.patch.object(writer, '_write_batch', side_effect=record):
+            writer._ensure_started()
+            writes[-1].wait(5)
+            writer.create(query='alone', results_file='alone.txt').wait(5)
+        self.assertEqual(batches, [4, 1])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class DeleteSearchFileTests(TestCase):
+    def test_history_delete_failure_is_reported(self):
+        with mock.patch('search_app.s3.delete_s3_file', return_value=True), \
+                mock.patch.object(views, 'delete_search_queries', side_effect=TimeoutError):
+            response = self.client.post(reverse('search_app:delete_search_file', args=['a.txt']))
+        self.assertRedirects(response, reverse('search_app:history'), fetch_redirect_response=False)
+        [message] = get_messages(response.wsgi_request)
+        self.assertEqual(message.level_tag, 'error')
+
+    @override_settings(SEARCH_DB_WRITE_BUFFER=False)
+    def test_deleting_an_s3_only_file_invalidates_the_history_fragment(self):
+        before = signals.get_fragment_version()
+        with mock.patch('search_app.s3.delete_s3_file', return_value=True):
+            self.client.post(reverse('search_app:delete_search_file', args=['s3_only.txt']))
+        self.assertNotEqual(signals.get_fragment_version(), before)
+
+
+@override_settings(SEARCH_PROFILING_SAMPLE_RATE=0)
+class ShouldProfileTests(SimpleTestCase):
+    def make_request(self, header=None, user=None):
+        request = RequestFactory().get('/', HTTP_X_PROFILE=header) if header else RequestFactory().get('/')
+        request.user = user or AnonymousUser()
+        return request
+
+    @override_settings(SEARCH_PROFILING_TOKEN=None)
+    def test_header_ignored_without_token(self):
+        self.assertFalse(profiling.should_profile(self.make_request('1')))
+
+    @override_settings(SEARCH_PROFILING_TOKEN='secret')
+    def test_header_must_match_token(self):
+        self.assertFalse(profiling.should_profile(self.make_request('wrong')))
+        self.assertTrue(profiling.should_profile(self.make_request('secret')))
+
+    @override_settings(SEARCH_PROFILING_TOKEN=None)
+    def test_staff_can_force_profile(self):
+        staff = User(username='admin', is_staff=True)
+        self.assertTrue(profiling.should_profile(self.make_request('1', staff)))
+        self.assertFalse(profiling.should_profile(self.make_request(user=staff)))
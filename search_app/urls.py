@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 app_name = 'search_app'
 
@@ -10,4 +10,11 @@ urlpatterns = [
     path('ajax-search/', views.ajax_search, name='ajax_search'),
     path('download/<str:filename>/', views.download_search_file, name='download_search_file'),
     path('delete/<str:filename>/', views.delete_search_file, name='delete_search_file'),
+    path('api/v1/search/', api.search, name='api_search'),
+    path('api/v1/search/locales/', api.search_locales, name='api_search_locales'),
+    path('api/v1/history/', api.history, name='api_history'),
+    path('api/v1/results/', api.stored_results, name='api_results'),
+    path('profiles/', views.profiles, name='profiles'),
+    path('profiles/<str:profile_id>/', views.profiles, name='profile_detail'),
+    path('profiles/<str:profile_id>/<str:filename>', views.profile_file, name='profile_file'),
 ]
\ No newline at end of file
@@ -1,390 +1,34 @@
 import os
-import requests
-import time
-import random
-from datetime import datetime
-from urllib.parse import urlencode, urlparse
-from bs4 import BeautifulSoup
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.conf import settings
-from django.http import JsonResponse
-from django.core.files.base import ContentFile
-from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, JsonResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from django.utils.functional import SimpleLazyObject
 from .models import SearchQuery
 from .forms import SearchForm
-import boto3
-from botocore.exceptions import NoCredentialsError, ClientError
+from . import search_cache
+from .signals import bump_fragment_version, get_fragment_version
+from .db_writer import create_search_query, delete_search_queries
+from . import profiling
+from .profiling import profiled
 
-class GoogleSearchScraper:
-    """Enhanced Google Search scraper using BeautifulSoup"""
-    
-    def __init__(self):
-        # Rotate user agents to avoid detection
-        self.user_agents = [
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0',
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:89.0) Gecko/20100101 Firefox/89.0'
-        ]
-    
-    def get_headers(self):
-        """Get randomized headers"""
-        return {
-            'User-Agent': random.choice(self.user_agents),
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        }
-    
-    def search_google(self, query, num_results=10, language='en'):
-        """
-        Scrape Google search results
-        """
-        try:
-            # Build Google search URL
-            params = {
-                'q': query,
-                'num': min(num_results, 100),  # Google allows max 100 results per page
-                'hl': language,
-                'gl': 'us',
-                'start': 0
-            }
-            
-            url = f"https://www.google.com/search?{urlencode(params)}"
-            
-            # Make request with headers
-            session = requests.Session()
-            response = session.get(url, headers=self.get_headers(), timeout=15)
-            response.raise_for_status()
-            
-            # Parse with BeautifulSoup
-            soup = BeautifulSoup(response.content, 'lxml')
-            
-            results = []
-            
-            # Extract search results
-            # Google uses different div classes, so we'll try multiple selectors
-            search_containers = soup.find_all('div', class_='g') or soup.find_all('div', class_='tF2Cxc')
-            
-            for container in search_containers[:num_results]:
-                result = self._extract_result_data(container)
-                if result:
-                    results.append(result)
-            
-            # If no results found with primary method, try alternative extraction
-            if not results:
-                results = self._alternative_extraction(soup, num_results)
-            
-            return results
-            
-        except requests.RequestException as e:
-            print(f"Request error: {e}")
-            return []
-        except Exception as e:
-            print(f"Search error: {e}")
-            return []
-    
-    def _extract_result_data(self, container):
-        """Extract data from a search result container"""
-        try:
-            result = {}
-            
-            # Extract title and URL
-            title_element = container.find('h3') or container.find('a')
-            if title_element:
-                # Get the link
-                link_element = title_element.find_parent('a') or title_element
-                if link_element and link_element.get('href'):
-                    result['url'] = self._clean_google_url(link_element['href'])
-                
-                result['title'] = title_element.get_text(strip=True)
-            
-            # Extract snippet/description
-            snippet_selectors = [
-                '.VwiC3b',  # Common snippet class
-                '.s3v9rd',  # Alternative snippet class
-                '.st',      # Older snippet class
-                '[data-sncf="1"]',  # Another snippet selector
-            ]
-            
-            snippet = ""
-            for selector in snippet_selectors:
-                snippet_element = container.select_one(selector)
-                if snippet_element:
-                    snippet = snippet_element.get_text(strip=True)
-                    break
-            
-            # If no snippet found, try finding any text content
-            if not snippet:
-                text_divs = container.find_all('div', recursive=True)
-                for div in text_divs:
-                    text = div.get_text(strip=True)
-                    if len(text) > 50 and not text.startswith('http'):
-                        snippet = text[:300] + '...' if len(text) > 300 else text
-                        break
-            
-            result['snippet'] = snippet
-            
-            # Extract displayed URL (breadcrumb)
-            cite_element = container.find('cite') or container.select_one('.UdQCqe')
-            if cite_element:
-                result['display_url'] = cite_element.get_text(strip=True)
-            else:
-                result['display_url'] = result.get('url', '')
-            
-            # Only return if we have at least title and URL
-            if result.get('title') and result.get('url'):
-                return result
-            
-        except Exception as e:
-            print(f"Error extracting result: {e}")
-        
-        return None
-    
-    def _alternative_extraction(self, soup, num_results):
-        """Alternative method to extract search results"""
-        results = []
-        
-        try:
-            # Try to find all links with /url?q= pattern (Google's redirect links)
-            links = soup.find_all('a', href=True)
-            
-            for link in links:
-                href = link.get('href', '')
-                if '/url?q=' in href or href.startswith('http'):
-                    title_element = link.find('h3')
-                    if title_element:
-                        title = title_element.get_text(strip=True)
-                        url = self._clean_google_url(href)
-                        
-                        # Find snippet nearby
-                        snippet = ""
-                        parent = link.find_parent('div', class_='g') or link.find_parent()
-                        if parent:
-                            text_content = parent.get_text(strip=True)
-                            if len(text_content) > len(title):
-                                snippet = text_content[len(title):].strip()[:300]
-                        
-                        if title and url:
-                            results.append({
-                                'title': title,
-                                'url': url,
-                                'snippet': snippet,
-                                'display_url': url
-                            })
-                            
-                            if len(results) >= num_results:
-                                break
-        
-        except Exception as e:
-            print(f"Alternative extraction error: {e}")
-        
-        return results
-    
-    def _clean_google_url(self, url):
-        """Clean Google redirect URLs"""
-        if '/url?q=' in url:
-            # Extract the actual URL from Google's redirect
-            try:
-                from urllib.parse import parse_qs, urlparse
-                parsed = urlparse(url)
-                if parsed.path == '/url':
-                    query_params = parse_qs(parsed.query)
-                    actual_url = query_params.get('q', [''])[0]
-                    return actual_url
-            except:
-                pass
-        
-        # Remove any remaining Google parameters
-        if url.startswith('/'):
-            url = 'https://www.google.com' + url
-        
-        return url
-
-def search_bing(query, num_results=10):
-    """Alternative search using Bing (as backup)"""
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        url = f"https://www.bing.com/search?q={query}&count={num_results}"
-        response = requests.get(url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.content, 'lxml')
-        
-        results = []
-        search_results = soup.find_all('li', class_='b_algo')
-        
-        for result in search_results[:num_results]:
-            title_element = result.find('h2')
-            if title_element and title_element.find('a'):
-                title = title_element.get_text(strip=True)
-                url = title_element.find('a')['href']
-                
-                snippet_element = result.find('p') or result.find('div', class_='b_caption')
-                snippet = snippet_element.get_text(strip=True) if snippet_element else ""
-                
-                results.append({
-                    'title': title,
-                    'url': url,
-                    'snippet': snippet,
-                    'display_url': url
-                })
-        
-        return results
-        
-    except Exception as e:
-        print(f"Bing search error: {e}")
-        return []
+# Scraping (requests, bs4/lxml) and S3 (boto3) are imported inside the views
+# that use them, so worker boot and management commands don't pay for them
 
-def search_web(query, num_results=10, use_bing_fallback=True):
+def cached_search_web(query, num_results=10, language='en', country='us'):
     """
-    Enhanced web search with multiple fallback options
+    Web search served from cache; stale results are returned immediately
+    and refreshed in the background
     """
-    scraper = GoogleSearchScraper()
-    
-    # Add delay to be respectful to search engines
-    time.sleep(random.uniform(1, 3))
-    
-    # Try Google first
-    results = scraper.search_google(query, num_results)
-    
-    # If Google fails and fallback is enabled, try Bing
-    if not results and use_bing_fallback:
-        print("Google search failed, trying Bing...")
-        time.sleep(random.uniform(1, 2))
-        results = search_bing(query, num_results)
-    
-    # Filter out low-quality results
-    filtered_results = []
-    for result in results:
-        if (result.get('title') and 
-            len(result['title']) > 5 and 
-            result.get('url') and 
-            result['url'].startswith('http')):
-            filtered_results.append(result)
-    
-    return filtered_results
-
-def save_results_to_s3(query, results):
-    """Save search results to AWS S3 with enhanced formatting"""
-    try:
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"search_results/search_{timestamp}_{query.replace(' ', '_')[:50]}.txt"
-        
-        # Create file content
-        content = []
-        content.append(f"Search Query: {query}")
-        content.append(f"Search Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        content.append(f"Number of Results: {len(results)}")
-        content.append(f"Search Engine: Google (with Bing fallback)")
-        content.append("=" * 70)
-        content.append("")
-        
-        for i, result in enumerate(results, 1):
-            content.append(f"Result {i}:")
-            content.append(f"Title: {result.get('title', 'N/A')}")
-            content.append(f"URL: {result.get('url', 'N/A')}")
-            content.append(f"Display URL: {result.get('display_url', 'N/A')}")
-            snippet = result.get('snippet', 'N/A')
-            if len(snippet) > 500:
-                snippet = snippet[:500] + '...'
-            content.append(f"Snippet: {snippet}")
-            content.append("-" * 50)
-            content.append("")
-        
-        file_content = "\n".join(content)
-        
-        # Save to S3 using Django's default storage
-        file_path = default_storage.save(filename, ContentFile(file_content.encode('utf-8')))
-        
-        # Return just the filename for display purposes
-        return os.path.basename(file_path)
-        
-    except Exception as e:
-        print(f"S3 save error: {e}")
-        return None
+    return search_cache.get_or_revalidate(query, num_results, _search_web, language, country)
 
-def get_s3_file_url(filename):
-    """Generate a presigned URL for downloading the file from S3"""
-    try:
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            region_name='us-east-1'  # Update to your bucket region
-        )
-        
-        # Generate presigned URL (valid for 1 hour)
-        file_key = f"search_results/{filename}"
-        url = s3_client.generate_presigned_url(
-            'get_object',
-            # Params={'Bucket': settings.AWS_STORAGE_BUCKET_NAME, 'Key': file_key},
-            ExpiresIn=3600  # 1 hour
-        )
-        return url
-    except Exception as e:
-        print(f"Error generating S3 URL: {e}")
-        return None
-
-def list_s3_search_files():
-    """List all search result files in S3"""
-    try:
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            region_name='us-east-1'  # Update to your bucket region
-        )
-        
-        response = s3_client.list_objects_v2(
-            Bucket=settings.AWS_STORAGE_BUCKET_NAME,
-            Prefix='search_results/',
-            MaxKeys=100
-        )
-        
-        files = []
-        if 'Contents' in response:
-            for obj in response['Contents']:
-                files.append({
-                    'key': obj['Key'],
-                    'filename': os.path.basename(obj['Key']),
-                    'last_modified': obj['LastModified'],
-                    'size': obj['Size']
-                })
-        
-        return sorted(files, key=lambda x: x['last_modified'], reverse=True)
-        
-    except Exception as e:
-        print(f"Error listing S3 files: {e}")
-        return []
-
-def delete_s3_file(filename):
-    """Delete a search result file from S3"""
-    try:
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            region_name='us-east-1'  # Update to your bucket region
-        )
-        
-        file_key = f"search_results/{filename}"
-        s3_client.delete_object(
-            Bucket=settings.AWS_STORAGE_BUCKET_NAME,
-            Key=file_key
-        )
-        return True
-        
-    except Exception as e:
-        print(f"Error deleting S3 file: {e}")
-        return False
+def _search_web(query, num_results, language='en', country='us'):
+    # Only cache misses and refreshes need the scraper
+    from .scraping import search_web
+    return search_web(query, num_results, language=language, country=country)
 
+@profiled('index')
 def index(request):
     """Main search page with enhanced search functionality and S3 storage"""
     if request.method == 'POST':
@@ -397,9 +41,11 @@ def index(request):
             
             # Perform enhanced search
             try:
-                results = search_web(query, num_results=15)
+                results = cached_search_web(query, num_results=15)
                 
                 if results:
+                    from .s3 import get_s3_file_url, save_results_to_s3
+                    
                     # Save results to S3
                     filename = save_results_to_s3(query, results)
                     
@@ -407,8 +53,10 @@ def index(request):
                         # Generate S3 download URL
                         download_url = get_s3_file_url(filename)
                         
-                        # Save to database
-                        search_record = SearchQuery.objects.create(
+                        # Save to database through this process's write buffer, waiting
+                        # for the commit so failures are reported here
+                        search_record = create_search_query(
+                            wait=True,
                             query=query,
                             results_file=filename,
                             results_count=len(results)
@@ -448,29 +96,46 @@ def index(request):
     else:
         form = SearchForm()
     
-    # Get recent searches
+    # Get recent searches (lazy, only evaluated when the cached fragment is rebuilt)
     recent_searches = SearchQuery.objects.order_by('-created_at')[:10]
     
     return render(request, 'search_app/index.html', {
         'form': form,
-        'recent_searches': recent_searches
+        'recent_searches': recent_searches,
+        'fragment_version': get_fragment_version(),
+        'fragment_ttl': settings.SEARCH_FRAGMENT_CACHE_TTL,
     })
 
-def search_history(request):
-    """View search history with S3 file management"""
-    searches = SearchQuery.objects.order_by('-created_at')
+def _history_searches():
+    from .s3 import get_s3_file_url
+    
+    searches = list(SearchQuery.objects.order_by('-created_at'))
     
     # Add download URLs for each search
     for search in searches:
         if search.results_file:
             search.download_url = get_s3_file_url(search.results_file)
     
+    return searches
+
+def _list_s3_search_files():
+    from .s3 import list_s3_search_files
+    return list_s3_search_files()
+
+def search_history(request):
+    """View search history with S3 file management"""
+    # The history table is a cached fragment, so the database and S3 are
+    # only queried when it has to be rebuilt
+    searches = SimpleLazyObject(_history_searches)
+    
     # Also get list of all S3 files for management
-    s3_files = list_s3_search_files()
+    s3_files = SimpleLazyObject(_list_s3_search_files)
     
     return render(request, 'search_app/history.html', {
         'searches': searches,
-        's3_files': s3_files
+        's3_files': s3_files,
+        'fragment_version': get_fragment_version(),
+        'fragment_ttl': settings.SEARCH_FRAGMENT_CACHE_TTL,
     })
 
 def download_search_file(request, filename):
@@ -483,15 +148,30 @@ def download_search_file(request, filename):
 def delete_search_file(request, filename):
     """Delete a search result file from S3"""
     if request.method == 'POST':
+        from .s3 import delete_s3_file
+        
         if delete_s3_file(filename):
+            # The cached history lists S3 files too, and a file with no
+            # SearchQuery row sends no delete signal
+            bump_fragment_version()
             # Also delete from database if exists
-            SearchQuery.objects.filter(results_file=filename).delete()
-            messages.success(request, f"File {filename} deleted successfully.")
+            try:
+                delete_search_queries(filename)
+            except Exception as e:
+                print(f"Search history delete error: {e}")
+                messages.error(
+                    request,
+                    f"File {filename} was deleted, but its search history could not be removed. "
+                    f"Please try again later."
+                )
+            else:
+                messages.success(request, f"File {filename} deleted successfully.")
         else:
             messages.error(request, f"Failed to delete file {filename}.")
     
     return redirect('search_app:history')
 
+@profiled('ajax_search')
 def ajax_search(request):
     """AJAX endpoint for live search suggestions"""
     if request.method == 'GET':
@@ -499,7 +179,7 @@ def ajax_search(request):
         if len(query) >= 3:
             try:
                 # Quick search with fewer results for suggestions
-                results = search_web(query, num_results=5)
+                results = cached_search_web(query, num_results=5)
                 return JsonResponse({
                     'success': True,
                     'results': results[:5],
@@ -514,4 +194,37 @@ def ajax_search(request):
         return JsonResponse({
             'success': False,
             'error': 'Query too short'
-        })
\ No newline at end of file
+        })
+
+PROFILE_FILES = ('profile.prof', 'stacks.txt', 'memory.txt')
+
+@staff_member_required
+def profiles(request, profile_id=None):
+    """List saved request profiles, or show one"""
+    if not profiling.is_enabled():
+        raise Http404("Profiling is disabled")
+    
+    if profile_id is None:
+        profile_list = [profiling.load_profile_meta(pid) for pid in profiling.list_profile_ids()]
+        return render(request, 'search_app/profiles.html', {
+            'profiles': [profile for profile in profile_list if profile],
+        })
+    
+    profile = profiling.load_profile(profile_id)
+    if profile is None:
+        raise Http404("Profile not found")
+    return render(request, 'search_app/profiles.html', {
+        'profile': profile,
+        'files': PROFILE_FILES,
+    })
+
+@staff_member_required
+def profile_file(request, profile_id, filename):
+    """Download a raw profile file (pstats dump, collapsed stacks, memory report)"""
+    if not profiling.is_enabled() or filename not in PROFILE_FILES:
+        raise Http404("Profile file not found")
+    
+    path = os.path.join(profiling.get_profile_dir(), os.path.basename(profile_id), filename)
+    if not os.path.isfile(path):
+        raise Http404("Profile file not found")
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=f"{profile_id}_{filename}")
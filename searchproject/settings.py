@@ -71,6 +71,23 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Reuse connections across requests instead of opening one per request
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", 600)),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            # WAL lets readers run alongside the writer, and IMMEDIATE takes the
+            # write lock up front so concurrent workers wait (up to the timeout)
+            # instead of failing with "database is locked"
+            "timeout": 20,
+            "transaction_mode": "IMMEDIATE",
+            "init_command": (
+                "PRAGMA journal_mode=WAL;"
+                "PRAGMA synchronous=NORMAL;"
+                "PRAGMA temp_store=MEMORY;"
+                "PRAGMA cache_size=-20000;"
+                "PRAGMA mmap_size=134217728;"
+            ),
+        },
     }
 }
 
@@ -152,4 +169,87 @@ STATICFILES_DIRS = [
 STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 
 MEDIA_URL = f"https://{AWS_S3_CUSTOM_DOMAIN}/media/"
-MEDIA_ROOT = os.path.join(BASE_DIR, "mediafiles")
\ No newline at end of file
+MEDIA_ROOT = os.path.join(BASE_DIR, "mediafiles")
+
+# Cache (file based so web workers and management commands share entries)
+CACHE_LOCATION = os.getenv("DJANGO_CACHE_LOCATION", os.path.join(BASE_DIR, "django_cache"))
+CACHES = {
+    # Page fragments and their version key: a small, stable set
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.path.join(CACHE_LOCATION, "default"),
+        "OPTIONS": {"MAX_ENTRIES": 1000},
+    },
+    # One entry per (query, result count, locale) for SEARCH_CACHE_TTL + SEARCH_CACHE_STALE_TTL,
+    # sized for the distinct queries seen in that window so culling doesn't evict live results
+    "search_results": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.path.join(CACHE_LOCATION, "search_results"),
+        "TIMEOUT": None,
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", 20000))},
+    },
+}
+SEARCH_CACHE_ALIAS = "search_results"
+
+# Search result caching (stale-while-revalidate)
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", 3600))  # Served without revalidation
+SEARCH_CACHE_STALE_TTL = int(os.getenv("SEARCH_CACHE_STALE_TTL", 86400))  # Served while refreshing
+SEARCH_CACHE_REFRESH_WORKERS = 2
+
+# Popular-query prefetch (manage.py prefetch_searches)
+SEARCH_PREFETCH_BUDGET = int(os.getenv("SEARCH_PREFETCH_BUDGET", 20))  # Max queries refreshed per run
+SEARCH_PREFETCH_LOOKBACK_DAYS = 7
+
+# Raw results page archive (manage.py reextract)
+SERP_ARCHIVE_ENABLED = os.getenv("SERP_ARCHIVE_ENABLED", "1") == "1"
+SERP_ARCHIVE_RETENTION_DAYS = int(os.getenv("SERP_ARCHIVE_RETENTION_DAYS", 30))
+SERP_ARCHIVE_MAX_PAGE_BYTES = 512 * 1024  # Compressed, larger pages are not archived
+SERP_ARCHIVE_MAX_TOTAL_BYTES = int(os.getenv("SERP_ARCHIVE_MAX_TOTAL_BYTES", 200 * 1024 * 1024))
+SERP_ARCHIVE_COMPRESSION_LEVEL = 6
+
+# Egress proxy pool (comma separated proxy URLs, empty means direct requests)
+SEARCH_PROXIES = [p.strip() for p in os.getenv("SEARCH_PROXIES", "").split(",") if p.strip()]
+SEARCH_PROXY_POOL_CLASS = "search_app.proxy_pool.ProxyPool"
+SEARCH_PROXY_REQUESTS_PER_MINUTE = int(os.getenv("SEARCH_PROXY_REQUESTS_PER_MINUTE", 6))  # Per proxy, per worker
+SEARCH_PROXY_BURST = 2
+SEARCH_PROXY_STICKY_SECONDS = 300
+SEARCH_PROXY_QUARANTINE_SECONDS = 300  # Doubles on each repeat block
+SEARCH_PROXY_MAX_QUARANTINE_SECONDS = 3600
+SEARCH_PROXY_MAX_FAILURES = 3  # Consecutive connection failures before quarantine
+SEARCH_PROXY_ACQUIRE_TIMEOUT = 30
+SEARCH_PROXY_MAX_ATTEMPTS = 2
+
+# Cached recent-searches and history fragments (also invalidated on every SearchQuery write)
+SEARCH_FRAGMENT_CACHE_TTL = 600  # Keep below AWS_QUERYSTRING_EXPIRE, the history links are presigned
+
+# JSON API (/api/v1/)
+SEARCH_API_MAX_RESULTS = 100  # /api/v1/search/ always fetches this many and slices to ?num=
+SEARCH_API_MIN_COMPRESS_BYTES = 200  # Smaller responses are sent uncompressed
+# Kept at the engine burst: uncached locales beyond it wait for the rate limit
+# (60 / requests_per_minute seconds each) on direct requests
+SEARCH_API_MAX_LOCALES = 4
+
+# Per-engine limits for direct (unproxied) requests, shared by all searches in a
+# worker (burst defaults to concurrency). Proxied requests are limited per proxy
+# by SEARCH_PROXY_REQUESTS_PER_MINUTE instead, so throughput scales with SEARCH_PROXIES
+SEARCH_ENGINE_LIMITS = {
+    "google": {"concurrency": 4, "requests_per_minute": 30, "burst": 4},
+    "bing": {"concurrency": 4, "requests_per_minute": 30, "burst": 4},
+}
+SEARCH_HTTP_POOL_SIZE = 10  # Keep-alive connections per host for direct requests
+SEARCH_LOCALE_MAX_WORKERS = 8  # Concurrent locales in one multi-locale search
+
+# Buffered SearchQuery writes (group commit: writes queued in one process
+# while a transaction runs are committed together in the next one)
+SEARCH_DB_WRITE_BUFFER = os.getenv("SEARCH_DB_WRITE_BUFFER", "1") == "1"
+SEARCH_DB_MAX_BATCH = 500
+
+# Request profiling (opt-in, viewer at /profiles/ for staff users)
+SEARCH_PROFILING_ENABLED = os.getenv("SEARCH_PROFILING_ENABLED", "0") == "1"
+SEARCH_PROFILING_SAMPLE_RATE = float(os.getenv("SEARCH_PROFILING_SAMPLE_RATE", 0.01))
+SEARCH_PROFILING_HEADER = "X-Profile"  # Forces a profile when it holds the token or comes from staff
+SEARCH_PROFILING_TOKEN = os.getenv("SEARCH_PROFILING_TOKEN")  # Unset: only staff can force profiles
+SEARCH_PROFILING_DIR = os.path.join(BASE_DIR, "profiles")
+SEARCH_PROFILING_STACK_INTERVAL = 0.005  # Seconds between stack samples
+SEARCH_PROFILING_TRACEMALLOC = True
+SEARCH_PROFILING_MAX_PROFILES = 200